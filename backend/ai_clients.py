@@ -0,0 +1,107 @@
+"""
+Process-wide registry of provider SDK clients, keyed by API key.
+
+Building a Gemini or Anthropic client sets up its own connection pool, so
+AIService gets them from here instead of creating new ones per operation.
+Async clients are bound to the event loop they were first used on (like
+http_client.py), so those are kept per running loop; code outside a loop shares
+one set per process. The Claude model catalog is cached per key for
+MODEL_CATALOG_TTL_SECONDS.
+"""
+import asyncio
+import hashlib
+import os
+import threading
+import time
+import weakref
+
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+MODEL_CATALOG_TTL_SECONDS = int(os.getenv("AI_MODEL_CATALOG_TTL_SECONDS", "3600"))
+MODEL_CATALOG_FAILURE_TTL_SECONDS = 300  # Retry sooner when we fell back to the static list
+
+_lock = threading.Lock()
+_loop_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = weakref.WeakKeyDictionary()
+_process_clients: dict = {}
+_model_catalogs: dict = {}  # key digest -> (expires_at, models)
+
+
+def _digest(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+def _clients_for_running_loop() -> dict:
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return _process_clients
+    clients = _loop_clients.get(loop)
+    if clients is None:
+        clients = {}
+        _loop_clients[loop] = clients
+    return clients
+
+
+def _get_or_create(registry: dict, name: str, api_key: str, factory):
+    key = (name, _digest(api_key))
+    with _lock:
+        if key not in registry:
+            try:
+                registry[key] = factory()
+                logger.info(f"Created shared {name} client")
+            except Exception as e:
+                logger.error(f"Failed to configure {name}: {e}")
+                registry[key] = None
+        return registry[key]
+
+
+def gemini_client(api_key: str):
+    """genai.Client for this key (and event loop, since its aio side is loop-bound), or None."""
+    if not api_key:
+        return None
+
+    def create():
+        from google import genai
+        return genai.Client(api_key=api_key)
+    return _get_or_create(_clients_for_running_loop(), "Gemini", api_key, create)
+
+
+def anthropic_async_client(api_key: str):
+    """AsyncAnthropic for this key and event loop, or None."""
+    if not api_key:
+        return None
+
+    def create():
+        import anthropic
+        # Retries are owned by the rate governor so they share backoff across workers
+        return anthropic.AsyncAnthropic(api_key=api_key, max_retries=0)
+    return _get_or_create(_clients_for_running_loop(), "Anthropic", api_key, create)
+
+
+def anthropic_client(api_key: str):
+    """Blocking Anthropic client for this key, shared by every thread, or None."""
+    if not api_key:
+        return None
+
+    def create():
+        import anthropic
+        return anthropic.Anthropic(api_key=api_key, max_retries=0)
+    return _get_or_create(_process_clients, "Anthropic (sync)", api_key, create)
+
+
+def claude_models(api_key: str, fetch, fallback: list) -> list:
+    """Cached Claude model catalog for this key; `fetch()` refreshes it, returning `fallback` on failure."""
+    digest = _digest(api_key or "")
+    now = time.monotonic()
+    with _lock:
+        cached = _model_catalogs.get(digest)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    models = fetch()
+    ttl = MODEL_CATALOG_FAILURE_TTL_SECONDS if models is fallback else MODEL_CATALOG_TTL_SECONDS
+    with _lock:
+        _model_catalogs[digest] = (now + ttl, models)
+    return models
@@ -0,0 +1,425 @@
+"""
+Provider-aware rate governor for LLM calls.
+
+Every request to Gemini or Anthropic goes through a slot keyed by provider and
+API key (hashed). A slot enforces, across all workers:
+
+- requests per minute and tokens per minute (GCRA buckets, one minute of burst),
+- a maximum number of in-flight calls (lease set with expiry, so a crashed
+  worker can't hold a lease forever).
+
+Redis is the coordinator; without it each process governs itself. Rate-limit and
+overload errors are retried with full-jitter exponential backoff, honoring
+Retry-After, and block the key for that long so other workers hold off too.
+"""
+import asyncio
+import hashlib
+import os
+import random
+import threading
+import time
+import uuid
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
+
+from politeness import parse_retry_after
+from logger_config import setup_logger
+
+try:
+    import redis as redis_sync
+    import redis.asyncio as aioredis
+except ImportError:
+    redis_sync = None
+    aioredis = None
+
+logger = setup_logger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL") or "redis://localhost:6379/0"
+KEY_PREFIX = "ai_governor:"
+
+# Per provider and API key; 0 disables a limit
+LIMITS = {
+    "gemini": {
+        "rpm": int(os.getenv("GEMINI_RPM", "1000")),
+        "tpm": int(os.getenv("GEMINI_TPM", "1000000")),
+        "max_in_flight": int(os.getenv("GEMINI_MAX_IN_FLIGHT", "16")),
+    },
+    "anthropic": {
+        "rpm": int(os.getenv("ANTHROPIC_RPM", "50")),
+        "tpm": int(os.getenv("ANTHROPIC_TPM", "40000")),
+        "max_in_flight": int(os.getenv("ANTHROPIC_MAX_IN_FLIGHT", "8")),
+    },
+}
+
+MAX_ATTEMPTS = int(os.getenv("AI_MAX_ATTEMPTS", "5"))
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 60.0
+LEASE_TTL_SECONDS = 600  # Longest call we expect; expired leases are reclaimed
+IN_FLIGHT_POLL_SECONDS = 0.25
+RETRYABLE_STATUS = {429, 500, 502, 503, 504, 529}
+RETRYABLE_ERRORS = {"APIConnectionError", "APITimeoutError", "ConnectError", "ReadTimeout"}
+
+# Reserves `cost` from a GCRA bucket and returns the wait (seconds). Burst = one minute of capacity.
+# KEYS[1] = bucket; ARGV = interval per unit, burst units, cost
+_RESERVE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local interval = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = math.min(tonumber(ARGV[3]), burst)
+local tat = math.max(tonumber(redis.call('GET', KEYS[1]) or '0'), now)
+local new_tat = tat + cost * interval
+local delay = new_tat - now - burst * interval
+if delay < 0 then delay = 0 end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000) + 1000)
+return tostring(delay)
+"""
+
+# Blocks a scope until now + seconds (after a 429). A separate key rather than the GCRA bucket's TAT:
+# the bucket's one-minute burst tolerance would absorb any penalty shorter than a minute.
+_PENALIZE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local until_ts = now + tonumber(ARGV[1])
+if until_ts > tonumber(redis.call('GET', KEYS[1]) or '0') then
+    redis.call('SET', KEYS[1], tostring(until_ts), 'PX', math.ceil(tonumber(ARGV[1]) * 1000) + 1000)
+end
+return 1
+"""
+
+# Seconds until a penalty set by _PENALIZE_SCRIPT ends (0 if none). KEYS[1] = blocked-until key
+_BLOCKED_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local remaining = tonumber(redis.call('GET', KEYS[1]) or '0') - now
+if remaining < 0 then remaining = 0 end
+return tostring(remaining)
+"""
+
+# Takes an in-flight lease if fewer than ARGV[2] are held. KEYS[1] = lease zset; ARGV = lease id, max, ttl
+_LEASE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[2]) then
+    redis.call('ZADD', KEYS[1], now + tonumber(ARGV[3]), ARGV[1])
+    redis.call('EXPIRE', KEYS[1], tonumber(ARGV[3]))
+    return 1
+end
+return 0
+"""
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token is close enough for pacing
+    return max(1, len(text or "") // 4)
+
+
+def status_code(error: Exception):
+    return getattr(error, "status_code", None) or getattr(error, "code", None)
+
+
+def is_retryable(error: Exception) -> bool:
+    return status_code(error) in RETRYABLE_STATUS or type(error).__name__ in RETRYABLE_ERRORS
+
+
+def retry_after(error: Exception) -> float:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    return parse_retry_after(headers.get("retry-after") or headers.get("Retry-After"))
+
+
+def backoff_delay(attempt: int, error: Exception = None) -> float:
+    """Retry-After when the provider sent one, else full-jitter exponential backoff."""
+    hinted = retry_after(error) if error is not None else 0.0
+    if hinted:
+        return hinted + random.uniform(0, 1)
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+class RateGovernor:
+    def __init__(self, limits: dict = None):
+        self.limits = limits or LIMITS
+        self._local_tat: dict = {}
+        self._local_blocked: dict = {}  # scope -> monotonic time a provider penalty ends
+        self._local_leases: dict = {}
+        self._local_lock = threading.Lock()
+        self._async_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._sync_client = None
+        self._redis_disabled_until = 0.0
+
+    # --- keys and Redis ------------------------------------------------------
+
+    @staticmethod
+    def _scope(provider: str, api_key: str) -> str:
+        digest = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+        return f"{KEY_PREFIX}{provider}:{digest}"
+
+    def _redis_available(self) -> bool:
+        return aioredis is not None and time.monotonic() >= self._redis_disabled_until
+
+    def _async_redis(self):
+        if not self._redis_available():
+            return None
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = aioredis.from_url(REDIS_URL, socket_connect_timeout=2, socket_timeout=2)
+            self._async_clients[loop] = client
+        return client
+
+    def _sync_redis(self):
+        if not self._redis_available():
+            return None
+        if self._sync_client is None:
+            self._sync_client = redis_sync.Redis.from_url(REDIS_URL, socket_connect_timeout=2, socket_timeout=2)
+        return self._sync_client
+
+    def _redis_failed(self, e: Exception):
+        self._redis_disabled_until = time.monotonic() + 60
+        logger.warning(f"AI rate governor: Redis unavailable, governing per process for 60s: {e}")
+
+    # --- local fallback ------------------------------------------------------
+
+    def _reserve_local(self, key: str, interval: float, burst: float, cost: float) -> float:
+        now = time.monotonic()
+        cost = min(cost, burst)
+        with self._local_lock:
+            tat = max(self._local_tat.get(key, 0.0), now)
+            new_tat = tat + cost * interval
+            self._local_tat[key] = new_tat
+        return max(0.0, new_tat - now - burst * interval)
+
+    def _lease_local(self, key: str, max_in_flight: int) -> bool:
+        with self._local_lock:
+            if self._local_leases.get(key, 0) < max_in_flight:
+                self._local_leases[key] = self._local_leases.get(key, 0) + 1
+                return True
+        return False
+
+    def _release_local(self, key: str):
+        with self._local_lock:
+            self._local_leases[key] = max(0, self._local_leases.get(key, 0) - 1)
+
+    def _blocked_local(self, scope: str) -> float:
+        with self._local_lock:
+            return max(0.0, self._local_blocked.get(scope, 0.0) - time.monotonic())
+
+    def _block_local(self, scope: str, seconds: float):
+        with self._local_lock:
+            self._local_blocked[scope] = max(self._local_blocked.get(scope, 0.0), time.monotonic() + seconds)
+
+    async def _blocked_for(self, scope: str) -> float:
+        redis = self._async_redis()
+        if redis is not None:
+            try:
+                return max(float(await redis.eval(_BLOCKED_SCRIPT, 1, f"{scope}:blocked")), self._blocked_local(scope))
+            except Exception as e:
+                self._redis_failed(e)
+        return self._blocked_local(scope)
+
+    def _blocked_for_sync(self, scope: str) -> float:
+        redis = self._sync_redis()
+        if redis is not None:
+            try:
+                return max(float(redis.eval(_BLOCKED_SCRIPT, 1, f"{scope}:blocked")), self._blocked_local(scope))
+            except Exception as e:
+                self._redis_failed(e)
+        return self._blocked_local(scope)
+
+    # --- rate buckets --------------------------------------------------------
+
+    def _buckets(self, provider: str, scope: str, tokens: int) -> list:
+        """(key, interval per unit, burst, cost) for each configured per-minute limit."""
+        limits = self.limits.get(provider, {})
+        buckets = []
+        if limits.get("rpm"):
+            buckets.append((f"{scope}:rpm", 60.0 / limits["rpm"], float(limits["rpm"]), 1.0))
+        if limits.get("tpm"):
+            buckets.append((f"{scope}:tpm", 60.0 / limits["tpm"], float(limits["tpm"]), float(tokens)))
+        return buckets
+
+    async def _reserve(self, provider: str, scope: str, tokens: int) -> float:
+        wait = 0.0
+        for key, interval, burst, cost in self._buckets(provider, scope, tokens):
+            redis = self._async_redis()
+            if redis is not None:
+                try:
+                    wait = max(wait, float(await redis.eval(_RESERVE_SCRIPT, 1, key, interval, burst, cost)))
+                    continue
+                except Exception as e:
+                    self._redis_failed(e)
+            wait = max(wait, self._reserve_local(key, interval, burst, cost))
+        return wait
+
+    def _reserve_sync(self, provider: str, scope: str, tokens: int) -> float:
+        wait = 0.0
+        for key, interval, burst, cost in self._buckets(provider, scope, tokens):
+            redis = self._sync_redis()
+            if redis is not None:
+                try:
+                    wait = max(wait, float(redis.eval(_RESERVE_SCRIPT, 1, key, interval, burst, cost)))
+                    continue
+                except Exception as e:
+                    self._redis_failed(e)
+            wait = max(wait, self._reserve_local(key, interval, burst, cost))
+        return wait
+
+    # --- in-flight leases ----------------------------------------------------
+
+    async def _take_lease(self, key: str, lease_id: str, max_in_flight: int) -> Optional[str]:
+        """Backend that granted the lease ("redis" or "local"), or None if none is free."""
+        redis = self._async_redis()
+        if redis is not None:
+            try:
+                granted = await redis.eval(_LEASE_SCRIPT, 1, key, lease_id, max_in_flight, LEASE_TTL_SECONDS)
+                return "redis" if granted else None
+            except Exception as e:
+                self._redis_failed(e)
+        return "local" if self._lease_local(key, max_in_flight) else None
+
+    async def _drop_lease(self, key: str, lease_id: str, backend: str):
+        # Released where it was granted: Redis may have gone down or come back while the call ran
+        if backend == "local":
+            self._release_local(key)
+            return
+        redis = self._async_redis()
+        if redis is None:
+            return  # Expires from the ZSET after LEASE_TTL_SECONDS
+        try:
+            await redis.zrem(key, lease_id)
+        except Exception as e:
+            self._redis_failed(e)
+
+    def _take_lease_sync(self, key: str, lease_id: str, max_in_flight: int) -> Optional[str]:
+        redis = self._sync_redis()
+        if redis is not None:
+            try:
+                granted = redis.eval(_LEASE_SCRIPT, 1, key, lease_id, max_in_flight, LEASE_TTL_SECONDS)
+                return "redis" if granted else None
+            except Exception as e:
+                self._redis_failed(e)
+        return "local" if self._lease_local(key, max_in_flight) else None
+
+    def _drop_lease_sync(self, key: str, lease_id: str, backend: str):
+        if backend == "local":
+            self._release_local(key)
+            return
+        redis = self._sync_redis()
+        if redis is None:
+            return
+        try:
+            redis.zrem(key, lease_id)
+        except Exception as e:
+            self._redis_failed(e)
+
+    # --- public API ----------------------------------------------------------
+
+    @asynccontextmanager
+    async def slot(self, provider: str, api_key: str, prompt: str = ""):
+        """Wait for RPM/TPM budget and an in-flight lease; held while the call runs."""
+        scope = self._scope(provider, api_key)
+        # A provider penalty is honoured before reserving, so waiting callers don't also use up the budget
+        while (blocked := await self._blocked_for(scope)) > 0:
+            logger.info(f"AI rate governor: {provider} throttled, waiting {blocked:.1f}s")
+            await asyncio.sleep(blocked)
+        wait = await self._reserve(provider, scope, estimate_tokens(prompt))
+        if wait > 0:
+            logger.info(f"AI rate governor: waiting {wait:.1f}s for {provider} budget")
+            await asyncio.sleep(wait)
+
+        max_in_flight = self.limits.get(provider, {}).get("max_in_flight")
+        if not max_in_flight:
+            yield
+            return
+
+        key, lease_id = f"{scope}:inflight", uuid.uuid4().hex
+        while (backend := await self._take_lease(key, lease_id, max_in_flight)) is None:
+            await asyncio.sleep(IN_FLIGHT_POLL_SECONDS * random.uniform(0.5, 1.5))
+        try:
+            yield
+        finally:
+            await self._drop_lease(key, lease_id, backend)
+
+    @contextmanager
+    def slot_sync(self, provider: str, api_key: str, prompt: str = ""):
+        """Blocking twin of slot() for synchronous callers."""
+        scope = self._scope(provider, api_key)
+        while (blocked := self._blocked_for_sync(scope)) > 0:
+            logger.info(f"AI rate governor: {provider} throttled, waiting {blocked:.1f}s")
+            time.sleep(blocked)
+        wait = self._reserve_sync(provider, scope, estimate_tokens(prompt))
+        if wait > 0:
+            logger.info(f"AI rate governor: waiting {wait:.1f}s for {provider} budget")
+            time.sleep(wait)
+
+        max_in_flight = self.limits.get(provider, {}).get("max_in_flight")
+        if not max_in_flight:
+            yield
+            return
+
+        key, lease_id = f"{scope}:inflight", uuid.uuid4().hex
+        while (backend := self._take_lease_sync(key, lease_id, max_in_flight)) is None:
+            time.sleep(IN_FLIGHT_POLL_SECONDS * random.uniform(0.5, 1.5))
+        try:
+            yield
+        finally:
+            self._drop_lease_sync(key, lease_id, backend)
+
+    async def throttled(self, provider: str, api_key: str, seconds: float):
+        """A provider said slow down: hold back every worker using this key."""
+        scope = self._scope(provider, api_key)
+        redis = self._async_redis()
+        if redis is not None:
+            try:
+                await redis.eval(_PENALIZE_SCRIPT, 1, f"{scope}:blocked", seconds)
+                return
+            except Exception as e:
+                self._redis_failed(e)
+        self._block_local(scope, seconds)
+
+    def throttled_sync(self, provider: str, api_key: str, seconds: float):
+        scope = self._scope(provider, api_key)
+        redis = self._sync_redis()
+        if redis is not None:
+            try:
+                redis.eval(_PENALIZE_SCRIPT, 1, f"{scope}:blocked", seconds)
+                return
+            except Exception as e:
+                self._redis_failed(e)
+        self._block_local(scope, seconds)
+
+
+governor = RateGovernor()
+
+
+async def governed_call(provider: str, api_key: str, prompt: str, fn):
+    """Run `await fn()` inside a governor slot, retrying rate-limit/overload errors with backoff."""
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            async with governor.slot(provider, api_key, prompt):
+                return await fn()
+        except Exception as e:
+            if not is_retryable(e) or attempt == MAX_ATTEMPTS - 1:
+                raise
+            delay = backoff_delay(attempt, e)
+            if status_code(e) == 429:
+                await governor.throttled(provider, api_key, delay)
+            logger.warning(f"{provider} returned {status_code(e)}, retrying in {delay:.1f}s (attempt {attempt + 1}/{MAX_ATTEMPTS})")
+            await asyncio.sleep(delay)
+
+
+def governed_call_sync(provider: str, api_key: str, prompt: str, fn):
+    """Blocking twin of governed_call()."""
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            with governor.slot_sync(provider, api_key, prompt):
+                return fn()
+        except Exception as e:
+            if not is_retryable(e) or attempt == MAX_ATTEMPTS - 1:
+                raise
+            delay = backoff_delay(attempt, e)
+            if status_code(e) == 429:
+                governor.throttled_sync(provider, api_key, delay)
+            logger.warning(f"{provider} returned {status_code(e)}, retrying in {delay:.1f}s (attempt {attempt + 1}/{MAX_ATTEMPTS})")
+            time.sleep(delay)
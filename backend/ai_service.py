@@ -1,11 +1,16 @@
 import os
 import json
+import functools
 import logging
-from google import genai
 from google.genai import types
 from typing import Dict, Any, Optional
 from dotenv import load_dotenv
 from logger_config import setup_logger
+import response_cache
+import enrichment_profiles
+import ai_clients
+from ai_rate_governor import governed_call, governed_call_sync
+import asyncio
 import time
 
 load_dotenv()
@@ -39,42 +44,46 @@ def normalize_metadata(values):
 
     return list(set(normalized)) # Deduplicate
 
-DEFAULT_ANALYSIS_PROMPT = """
-        You are an expert news analyst. Analyze the following news article.
-
-        Headline: {title}
-        Text: {text}
-
-        Tasks:
-        1.  **Language**: Detect the language of the article key (e.g., 'en', 'es', 'pt').
-        2.  **Cleaning**: Clean the original article text. Remove HTML tags, advertisements, "read more" links, and UI artifacts. Keep only the core journalistic content in the original language.
-        3.  **Translation**:
-            - Translate the Headline to English.
-            - Translate the Cleaned Text to English.
-        4.  **Relevance**: Determine if this article is relevant to "{topic_focus}". (true/false) & Score (0-100).
-        5.  **Tags**: Extract key Tags (max 5) in BOTH English and Original Language. Format: ALL CAPS, no diacritics, use underscores for spaces (e.g., "MARKET_INDEX").
-        6.  **Entities**: Extract key Named Entities in BOTH English and Original Language. Format: ALL CAPS, no diacritics, use underscores for spaces (e.g., "WORLD_BANK").
-        7.  **Sentiment**: Determine Sentiment (positive, neutral, negative).
-        8.  **Executive Summary**: Generate a "One-Sentence Executive Summary" in BOTH English and Original Language.
-
-        Return ONLY raw valid JSON (no markdown formatting) with the following structure:
-        {{
-            "language": "pt",
-            "cleaned_text_original": "...",
-            "translated_title": "...",
-            "translated_text": "...",
-            "is_relevant": true,
-            "relevance_score": 85,
-            "tags_en": ["Economy", "Inflation"],
-            "tags_original": ["Economia", "Inflação"],
-            "entities_en": ["Bank of England"],
-            "entities_original": ["Banco de Inglaterra"],
-            "sentiment": "neutral",
-            "ai_summary_en": "...",
-            "ai_summary_original": "..."
-        }}
+# The default profile's prompt; what /api/ai/defaults shows and custom analysis prompts start from
+DEFAULT_ANALYSIS_PROMPT = enrichment_profiles.build_prompt(enrichment_profiles.DEFAULT_PROFILE)
+
+# Wraps an analysis prompt so one request covers several articles
+BATCH_ANALYSIS_WRAPPER = """
+{instructions}
+
+        You will receive {count} articles as a JSON array below instead of a single Headline/Text.
+        Analyze EACH article independently as described above.
+        Return ONLY a raw JSON array with exactly one object per article. Each object must contain
+        the article's "id" exactly as given, plus the keys described above.
+
+        Articles:
+        {articles}
+        """
+
+# First stage of two-stage enrichment: a low-token relevance/language check per article
+RELEVANCE_GATE_PROMPT = """
+        For each news article below, decide whether it is relevant to "{topic_focus}".
+        Return ONLY a raw JSON array with one object per article:
+        {"id": "<id as given>", "language": "<ISO 639-1 code>", "relevance_score": <0-100>}
+
+        Articles:
+        {articles}
         """
 
+RELEVANCE_GATE_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "id": {"type": "STRING"},
+            "language": {"type": "STRING"},
+            "relevance_score": {"type": "INTEGER"},
+        },
+        "required": ["id", "relevance_score"],
+    },
+}
+RELEVANCE_GATE_TEXT_CHARS = 600  # Lead paragraphs are enough to judge the topic
+
 # Fallback Claude models used when the Anthropic API is unreachable.
 CLAUDE_MODELS_FALLBACK = [
     {"id": "claude-opus-4-6", "name": "Claude Opus 4.6"},
@@ -117,44 +126,47 @@ def _strip_json_fences(text: str) -> str:
     return text.strip()
 
 
+def _parse_json_response(text: str) -> Any:
+    """json.loads after stripping fences; falls back to the outermost object/array in the text."""
+    text = _strip_json_fences(text or "")
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError as e:
+        starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+        end = max(text.rfind("}"), text.rfind("]"))
+        if starts and end > min(starts):
+            try:
+                return json.loads(text[min(starts):end + 1])
+            except json.JSONDecodeError:
+                pass
+        raise ValueError(f"Unparseable JSON response ({len(text):,} chars): {text[:200]!r}") from e
+
+
 class AIService:
     def __init__(self, api_key: str = None, anthropic_api_key: str = None):
         # Google/Gemini setup
         self.google_api_key = api_key or os.environ.get("GOOGLE_API_KEY")
-        self.gemini_client = None
-
-        if self.google_api_key:
-            try:
-                self.gemini_client = genai.Client(api_key=self.google_api_key)
-                logger.info("Gemini client initialized.")
-            except Exception as e:
-                logger.error(f"Failed to configure Gemini: {e}")
 
         # Anthropic/Claude setup
         self.anthropic_api_key = anthropic_api_key or os.environ.get("ANTHROPIC_API_KEY")
-        self.anthropic_client = None
-
-        if self.anthropic_api_key:
-            try:
-                import anthropic
-                self.anthropic_client = anthropic.AsyncAnthropic(api_key=self.anthropic_api_key)
-                logger.info("Anthropic client initialized.")
-            except Exception as e:
-                logger.error(f"Failed to configure Anthropic: {e}")
 
         self.enabled = bool(self.gemini_client or self.anthropic_client)
         if not self.enabled:
             logger.warning("No AI API keys found. AI features will be disabled.")
 
-        # Cache for Claude model list (populated lazily, lives for this instance)
-        self._claude_models_cache: Optional[list] = None
+    # Clients come from the shared registry: one pool per key (and event loop), not per service
+    @property
+    def gemini_client(self):
+        return ai_clients.gemini_client(self.google_api_key)
+
+    @property
+    def anthropic_client(self):
+        return ai_clients.anthropic_async_client(self.anthropic_api_key)
 
     def _fetch_claude_models_sync(self) -> list:
         """Fetch available Claude models from the Anthropic API and add :thinking variants."""
         try:
-            import anthropic as _anthropic
-            client = _anthropic.Anthropic(api_key=self.anthropic_api_key)
-            page = client.models.list(limit=100)
+            page = ai_clients.anthropic_client(self.anthropic_api_key).models.list(limit=100)
             base_models = []
             for m in page.data:
                 if m.id.startswith("claude-"):
@@ -175,10 +187,8 @@ class AIService:
             return CLAUDE_MODELS_FALLBACK
 
     def _get_claude_models(self) -> list:
-        """Return Claude models, using instance-level cache."""
-        if self._claude_models_cache is None:
-            self._claude_models_cache = self._fetch_claude_models_sync()
-        return self._claude_models_cache
+        """Return Claude models from the process-wide catalog cache."""
+        return ai_clients.claude_models(self.anthropic_api_key, self._fetch_claude_models_sync, CLAUDE_MODELS_FALLBACK)
 
     def _resolve_claude_model(self, model_name: str) -> str:
         """
@@ -223,11 +233,17 @@ class AIService:
             return self._anthropic_enabled()
         return self._gemini_enabled()
 
-    async def analyze_article(self, title: str, text: str, topic_focus: str = "Economics, Trade, Politics, or Finance", model_name: str = "gemini-1.5-flash", custom_prompt: str = None, debug_logger: Any = None) -> Dict[str, Any]:
+    async def analyze_article(self, title: str, text: str, topic_focus: str = "Economics, Trade, Politics, or Finance", model_name: str = "gemini-1.5-flash", custom_prompt: str = None, debug_logger: Any = None, use_cache: bool = True, translate: bool = True, profile: str = None) -> Dict[str, Any]:
+        """
+        Analyze one article with the enrichment `profile`'s prompt and schema (see enrichment_profiles),
+        or with `custom_prompt` as free-form JSON. `translate=False` (article known to be English)
+        leaves the translation fields out of the request unless a custom prompt is set.
+        """
         if not self.enabled:
             return {}
 
-        raw_prompt = custom_prompt if custom_prompt else DEFAULT_ANALYSIS_PROMPT
+        english_only = not translate and not custom_prompt
+        raw_prompt = custom_prompt if custom_prompt else enrichment_profiles.build_prompt(profile, english_only)
 
         if not model_name:
             logger.error("No AI model configured for analysis.")
@@ -240,14 +256,20 @@ class AIService:
         if debug_logger:
             debug_logger.log_step(f"analyze_{title[:20].strip()}_prompt", prompt)
 
+        if use_cache:
+            cached = await asyncio.to_thread(response_cache.get, prompt, model_name, "analysis")
+            if cached is not None:
+                try:
+                    return enrichment_profiles.expand(_parse_json_response(cached), title, text, english_only)
+                except ValueError:
+                    logger.warning("Discarding unparseable cached analysis")
+
         start_time = time.time()
         logger.debug(f"LLM Request [Title]: {title} | Model: {model_name}")
 
         try:
-            if _is_claude_model(model_name):
-                response_text = await self._call_anthropic_raw(prompt, model_name)
-            else:
-                response_text = await self._call_gemini_raw(prompt, model_name, response_mime_type="application/json")
+            schema_profile = None if custom_prompt else (profile or enrichment_profiles.DEFAULT_PROFILE)
+            response_text = await self._call_analysis(prompt, model_name, schema_profile, english_only, batch=False)
 
             elapsed = time.time() - start_time
             logger.info(f"LLM Response | Model: {model_name} | Time: {elapsed:.2f}s")
@@ -256,13 +278,134 @@ class AIService:
             if debug_logger:
                 debug_logger.log_step(f"analyze_{title[:20].strip()}_response_raw", response_text)
 
-            return json.loads(_strip_json_fences(response_text))
+            result = enrichment_profiles.expand(_parse_json_response(response_text), title, text, english_only)
+            if use_cache and result:
+                await asyncio.to_thread(response_cache.put, prompt, model_name, "analysis", response_text)
+            return result
         except Exception as e:
             logger.error(f"AI Analysis failed: {e}")
             if debug_logger:
                 debug_logger.log_step(f"analyze_{title[:20].strip()}_error", str(e))
             return {}
 
+    async def analyze_articles_batch(self, articles: list, topic_focus: str = "Economics, Trade, Politics, or Finance", model_name: str = "gemini-1.5-flash", custom_prompt: str = None, debug_logger: Any = None, translate: bool = True, profile: str = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Analyze several articles in one request.
+
+        `articles` is a list of {"id", "title", "text"}; returns {id: analysis}. Articles the
+        batch response doesn't cover (unparseable response, missing or unknown ids) are
+        analyzed one by one with analyze_article. `translate=False` means every article is
+        English; `profile` as in analyze_article.
+        """
+        if not self.enabled or not articles:
+            return {}
+        if not model_name:
+            logger.error("No AI model configured for analysis.")
+            return {}
+
+        english_only = not translate and not custom_prompt
+        results: Dict[str, Dict[str, Any]] = {}
+        if len(articles) > 1:
+            raw_prompt = custom_prompt if custom_prompt else enrichment_profiles.build_prompt(profile, english_only)
+            instructions = raw_prompt.replace("{title}", "(see the articles below)") \
+                                     .replace("{text}", "(see the articles below)") \
+                                     .replace("{topic_focus}", topic_focus)
+            payload = json.dumps(
+                [{"id": a["id"], "headline": a["title"], "text": (a["text"] or "")[:3000]} for a in articles],
+                ensure_ascii=False
+            )
+            prompt = BATCH_ANALYSIS_WRAPPER.replace("{instructions}", instructions) \
+                                           .replace("{count}", str(len(articles))) \
+                                           .replace("{articles}", payload)
+
+            if debug_logger:
+                debug_logger.log_step(f"analyze_batch_{len(articles)}_prompt", prompt)
+
+            start_time = time.time()
+            try:
+                # Custom prompts define their own fields, so they get no schema
+                schema_profile = None if custom_prompt else (profile or enrichment_profiles.DEFAULT_PROFILE)
+                response_text = await self._call_analysis(prompt, model_name, schema_profile, english_only, batch=True)
+                logger.info(f"LLM Batch Response | Model: {model_name} | Articles: {len(articles)} | Time: {time.time() - start_time:.2f}s")
+
+                parsed = _parse_json_response(response_text)
+                if isinstance(parsed, dict):
+                    parsed = parsed.get("articles") or parsed.get("items") or []
+
+                by_id = {str(a["id"]): a for a in articles}
+                for item in parsed if isinstance(parsed, list) else []:
+                    if isinstance(item, dict) and str(item.get("id")) in by_id:
+                        article = by_id[str(item["id"])]
+                        result = enrichment_profiles.expand(
+                            {k: v for k, v in item.items() if k != "id"}, article["title"], article["text"], english_only
+                        )
+                        if result:
+                            results[str(item["id"])] = result
+            except Exception as e:
+                logger.warning(f"Batch analysis of {len(articles)} articles failed, falling back to single calls: {e}")
+
+        missing = [a for a in articles if str(a["id"]) not in results]
+        if missing and len(articles) > 1:
+            logger.info(f"Batch analysis covered {len(results)}/{len(articles)} articles; analyzing {len(missing)} individually")
+        for a in missing:
+            results[str(a["id"])] = await self.analyze_article(
+                a["title"], a["text"], topic_focus, model_name=model_name,
+                custom_prompt=custom_prompt, debug_logger=debug_logger, translate=translate, profile=profile
+            )
+        return results
+
+    async def screen_articles(self, articles: list, topic_focus: str = "Economics, Trade, Politics, or Finance", model_name: str = "gemini-2.0-flash-lite") -> Dict[str, Dict[str, Any]]:
+        """
+        Cheap relevance screen for several articles in one request.
+
+        `articles` is a list of {"id", "title", "text"}; returns {id: {"language", "relevance_score"}}
+        for the articles the response covers. Failures return {} so callers fall through to the
+        full analysis.
+        """
+        if not self.enabled or not articles or not model_name:
+            return {}
+
+        payload = json.dumps(
+            [{"id": a["id"], "headline": a["title"], "text": (a["text"] or "")[:RELEVANCE_GATE_TEXT_CHARS]} for a in articles],
+            ensure_ascii=False
+        )
+        prompt = RELEVANCE_GATE_PROMPT.replace("{topic_focus}", topic_focus) \
+                                      .replace("{articles}", payload)
+
+        start_time = time.time()
+        try:
+            cached = await asyncio.to_thread(response_cache.get, prompt, model_name, "relevance_gate")
+            response_text = cached
+            if response_text is None:
+                if _is_claude_model(model_name):
+                    response_text = await self._call_anthropic_raw(prompt, model_name)
+                else:
+                    response_text = await self._call_gemini_raw(
+                        prompt, model_name, response_mime_type="application/json", response_schema=RELEVANCE_GATE_SCHEMA
+                    )
+                logger.info(f"LLM Relevance Gate | Model: {model_name} | Articles: {len(articles)} | Time: {time.time() - start_time:.2f}s")
+
+            parsed = _parse_json_response(response_text)
+            if isinstance(parsed, dict):
+                parsed = parsed.get("articles") or parsed.get("items") or []
+            if cached is None:
+                await asyncio.to_thread(response_cache.put, prompt, model_name, "relevance_gate", response_text)
+        except Exception as e:
+            logger.warning(f"Relevance gate for {len(articles)} articles failed; sending them to full analysis: {e}")
+            return {}
+
+        expected = {str(a["id"]) for a in articles}
+        results: Dict[str, Dict[str, Any]] = {}
+        for item in parsed if isinstance(parsed, list) else []:
+            if not isinstance(item, dict) or str(item.get("id")) not in expected:
+                continue
+            try:
+                score = int(item.get("relevance_score"))
+            except (TypeError, ValueError):
+                continue
+            results[str(item["id"])] = {"language": item.get("language"), "relevance_score": score}
+        return results
+
     async def analyze_image_or_pdf(self, file_path: str, context_prompt: str, model_name: str = "gemini-2.0-flash-lite") -> Any:
         if not self.enabled:
             return None
@@ -283,11 +426,11 @@ class AIService:
             logger.info(f"File uploaded: {uploaded_file.name}")
 
             start_time = time.time()
-            response = await self.gemini_client.aio.models.generate_content(
+            response = await governed_call("gemini", self.google_api_key, context_prompt, lambda: self.gemini_client.aio.models.generate_content(
                 model=model_name,
                 contents=[uploaded_file, context_prompt],
                 config=types.GenerateContentConfig(response_mime_type="application/json")
-            )
+            ))
             elapsed = time.time() - start_time
             logger.info(f"Gemini Multimodal Response | Time: {elapsed:.2f}s")
             if response.text:
@@ -308,7 +451,7 @@ class AIService:
                 pdf_data = base64.standard_b64encode(f.read()).decode("utf-8")
 
             start_time = time.time()
-            message = await self.anthropic_client.messages.create(
+            message = await governed_call("anthropic", self.anthropic_api_key, context_prompt, lambda: self.anthropic_client.messages.create(
                 model=model_name,
                 max_tokens=8096,
                 messages=[{
@@ -325,7 +468,7 @@ class AIService:
                         {"type": "text", "text": context_prompt}
                     ],
                 }]
-            )
+            ))
             elapsed = time.time() - start_time
             logger.info(f"Claude PDF Response | Time: {elapsed:.2f}s")
             text = message.content[0].text
@@ -334,7 +477,7 @@ class AIService:
             logger.error(f"Claude PDF Analysis Failed: {e}")
             return None
 
-    async def call(self, prompt: str, model_name: str = "gemini-2.0-flash-lite", response_mime_type: str = "application/json", debug_logger: Any = None) -> str:
+    async def call(self, prompt: str, model_name: str = "gemini-2.0-flash-lite", response_mime_type: str = "application/json", debug_logger: Any = None, use_cache: bool = True) -> str:
         if not self.enabled:
             return ""
 
@@ -344,6 +487,13 @@ class AIService:
         if debug_logger:
             debug_logger.log_step("step_2_prompt_rendered", prompt, extension="txt")
 
+        if use_cache:
+            cached = await asyncio.to_thread(response_cache.get, prompt, model_name, response_mime_type)
+            if cached is not None:
+                if debug_logger:
+                    debug_logger.log_step("step_2_ai_response_raw", cached, extension="txt")
+                return cached
+
         try:
             if _is_claude_model(model_name):
                 result = await self._call_anthropic_raw(prompt, model_name)
@@ -352,6 +502,8 @@ class AIService:
 
             if not result:
                 logger.warning(f"AI Response empty for model: {model_name}")
+            elif use_cache:
+                await asyncio.to_thread(response_cache.put, prompt, model_name, response_mime_type, result)
 
             if debug_logger:
                 debug_logger.log_step("step_2_ai_response_raw", result, extension="txt")
@@ -363,17 +515,61 @@ class AIService:
                 debug_logger.log_step("step_2_ai_error", str(e))
             raise
 
-    async def _call_gemini_raw(self, prompt: str, model_name: str, response_mime_type: str = "application/json") -> str:
+    async def _call_analysis(self, prompt: str, model_name: str, profile: Optional[str], english_only: bool, batch: bool) -> str:
+        """Provider-native structured output for `profile` (None = free-form JSON, e.g. custom prompts)."""
+        if _is_claude_model(model_name):
+            # Extended thinking can't be combined with a forced tool call
+            if profile and not _is_thinking_model(model_name):
+                return await self._call_anthropic_structured(
+                    prompt, model_name, enrichment_profiles.json_schema(profile, english_only, batch)
+                )
+            return await self._call_anthropic_raw(prompt, model_name)
+        return await self._call_gemini_raw(
+            prompt, model_name, response_mime_type="application/json",
+            response_schema=enrichment_profiles.gemini_schema(profile, english_only, batch) if profile else None
+        )
+
+    async def _call_anthropic_structured(self, prompt: str, model_name: str, schema: dict) -> str:
+        """Claude call forced through a tool whose input schema is `schema`; returns the input as JSON."""
+        if not self._anthropic_enabled():
+            raise RuntimeError("Anthropic client not initialized")
+
+        model_name = self._resolve_claude_model(model_name)
+        kwargs = dict(
+            model=_base_model_name(model_name),
+            max_tokens=32000,
+            messages=[{"role": "user", "content": prompt}],
+            tools=[{"name": "record_analysis", "description": "Record the article analysis.", "input_schema": schema}],
+            tool_choice={"type": "tool", "name": "record_analysis"},
+        )
+
+        async def _stream():
+            async with self.anthropic_client.messages.stream(**kwargs) as stream:
+                return await stream.get_final_message()
+
+        message = await governed_call("anthropic", self.anthropic_api_key, prompt, _stream)
+        if message.stop_reason == "max_tokens":
+            raise RuntimeError(
+                f"Claude response was truncated (stop_reason=max_tokens). "
+                f"The model hit the {kwargs['max_tokens']:,}-token output limit before finishing."
+            )
+        for block in message.content:
+            if block.type == "tool_use":
+                return json.dumps(block.input, ensure_ascii=False)
+        raise RuntimeError("Claude returned no structured analysis")
+
+    async def _call_gemini_raw(self, prompt: str, model_name: str, response_mime_type: str = "application/json", response_schema: Any = None) -> str:
         if not self._gemini_enabled():
             raise RuntimeError("Gemini client not initialized")
-        response = await self.gemini_client.aio.models.generate_content(
+        response = await governed_call("gemini", self.google_api_key, prompt, lambda: self.gemini_client.aio.models.generate_content(
             model=model_name,
             contents=prompt,
             config=types.GenerateContentConfig(
                 response_mime_type=response_mime_type,
+                response_schema=response_schema,
                 max_output_tokens=65536,
             )
-        )
+        ))
         text = response.text or ""
         candidate = response.candidates[0] if response.candidates else None
         if candidate and str(candidate.finish_reason) in ("FinishReason.MAX_TOKENS", "MAX_TOKENS", "2"):
@@ -389,9 +585,6 @@ class AIService:
         if not self._anthropic_enabled():
             raise RuntimeError("Anthropic client not initialized")
 
-        import anthropic as _anthropic
-        import asyncio
-
         model_name = self._resolve_claude_model(model_name)
         thinking = _is_thinking_model(model_name)
         base_model = _base_model_name(model_name)
@@ -404,18 +597,11 @@ class AIService:
         if thinking:
             kwargs["thinking"] = {"type": "enabled", "budget_tokens": THINKING_BUDGET_TOKENS}
 
-        message = None
-        for attempt in range(3):
-            try:
-                async with self.anthropic_client.messages.stream(**kwargs) as stream:
-                    message = await stream.get_final_message()
-                break
-            except _anthropic.RateLimitError as e:
-                if attempt == 2:
-                    raise
-                wait = 60 * (attempt + 1)
-                logger.warning(f"Anthropic rate limit hit, retrying in {wait}s (attempt {attempt + 1}/3): {e}")
-                await asyncio.sleep(wait)
+        async def _stream():
+            async with self.anthropic_client.messages.stream(**kwargs) as stream:
+                return await stream.get_final_message()
+
+        message = await governed_call("anthropic", self.anthropic_api_key, prompt, _stream)
 
         # Return only text blocks (thinking blocks are separate)
         text = "\n".join(block.text for block in message.content if block.type == "text")
@@ -430,19 +616,28 @@ class AIService:
 
         return text
 
-    def call_sync(self, prompt: str, model_name: str = "gemini-2.0-flash-lite", response_mime_type: str = "application/json") -> str:
+    def call_sync(self, prompt: str, model_name: str = "gemini-2.0-flash-lite", response_mime_type: str = "application/json", use_cache: bool = True) -> str:
         """Synchronous version of call() for use in non-async contexts (e.g. Celery tasks)."""
         if not self.enabled:
             return ""
         if not model_name:
             model_name = "gemini-2.0-flash-lite"
+        if use_cache:
+            cached = response_cache.get(prompt, model_name, response_mime_type)
+            if cached is not None:
+                return cached
+        text = self._call_sync_uncached(prompt, model_name, response_mime_type)
+        if text and use_cache:
+            response_cache.put(prompt, model_name, response_mime_type, text)
+        return text
+
+    def _call_sync_uncached(self, prompt: str, model_name: str, response_mime_type: str) -> str:
         try:
             if _is_claude_model(model_name):
                 if not self._anthropic_enabled():
                     raise RuntimeError("Anthropic client not initialized")
                 model_name = self._resolve_claude_model(model_name)
-                import anthropic as _anthropic
-                client = _anthropic.Anthropic(api_key=self.anthropic_api_key)
+                client = ai_clients.anthropic_client(self.anthropic_api_key)
                 thinking = _is_thinking_model(model_name)
                 base_model = _base_model_name(model_name)
                 kwargs = dict(
@@ -452,18 +647,11 @@ class AIService:
                 )
                 if thinking:
                     kwargs["thinking"] = {"type": "enabled", "budget_tokens": THINKING_BUDGET_TOKENS}
-                message = None
-                for attempt in range(3):
-                    try:
-                        with client.messages.stream(**kwargs) as stream:
-                            message = stream.get_final_message()
-                        break
-                    except _anthropic.RateLimitError as e:
-                        if attempt == 2:
-                            raise
-                        wait = 60 * (attempt + 1)
-                        logger.warning(f"Anthropic rate limit hit, retrying in {wait}s (attempt {attempt + 1}/3): {e}")
-                        time.sleep(wait)
+                def _stream():
+                    with client.messages.stream(**kwargs) as stream:
+                        return stream.get_final_message()
+
+                message = governed_call_sync("anthropic", self.anthropic_api_key, prompt, _stream)
                 text = "\n".join(block.text for block in message.content if block.type == "text")
                 if message.stop_reason == "max_tokens":
                     raise RuntimeError(
@@ -476,14 +664,14 @@ class AIService:
             else:
                 if not self._gemini_enabled():
                     raise RuntimeError("Gemini client not initialized")
-                response = self.gemini_client.models.generate_content(
+                response = governed_call_sync("gemini", self.google_api_key, prompt, lambda: self.gemini_client.models.generate_content(
                     model=model_name,
                     contents=prompt,
                     config=types.GenerateContentConfig(
                         response_mime_type=response_mime_type,
                         max_output_tokens=65536,
                     )
-                )
+                ))
                 text = response.text or ""
                 candidate = response.candidates[0] if response.candidates else None
                 if candidate and str(candidate.finish_reason) in ("FinishReason.MAX_TOKENS", "MAX_TOKENS", "2"):
@@ -518,3 +706,16 @@ class AIService:
             models.extend(self._get_claude_models())
 
         return models
+
+
+@functools.lru_cache(maxsize=256)
+def _service_for_keys(google_api_key: Optional[str], anthropic_api_key: Optional[str]) -> AIService:
+    return AIService(api_key=google_api_key, anthropic_api_key=anthropic_api_key)
+
+
+def get_ai_service(api_key: str = None, anthropic_api_key: str = None) -> AIService:
+    """Shared AIService for this pair of keys (env keys when omitted)."""
+    return _service_for_keys(
+        api_key or os.environ.get("GOOGLE_API_KEY"),
+        anthropic_api_key or os.environ.get("ANTHROPIC_API_KEY"),
+    )
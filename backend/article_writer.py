@@ -0,0 +1,95 @@
+"""
+Buffered bulk writer for crawled articles.
+
+Rows are inserted in one multi-row INSERT per batch that ignores conflicts on
+ix_articles_url_source (ON CONFLICT DO NOTHING on PostgreSQL, INSERT OR IGNORE on
+SQLite), so a crawl commits once per batch instead of once per article.
+"""
+from datetime import datetime, timezone
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from models import Article, generate_uuid
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_BATCH_SIZE = 50
+
+
+class ArticleBatchWriter:
+    def __init__(self, db: Session, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.db = db
+        self.batch_size = max(1, batch_size)
+        self.buffer: list = []
+        self.inserted = 0  # Rows actually written during this crawl
+
+    def add(self, article: Article, commit: bool = True) -> int:
+        """Buffer an article; flushes (and returns the inserted count) once the batch is full."""
+        self.buffer.append(article)
+        if len(self.buffer) >= self.batch_size:
+            return self.flush(commit=commit)
+        return 0
+
+    def flush(self, commit: bool = True) -> int:
+        """Write buffered rows in a single statement. With commit=False the caller owns the transaction."""
+        if not self.buffer:
+            return 0
+
+        rows = [self._to_row(article) for article in self.buffer]
+        batch_size = len(rows)
+        self.buffer = []
+
+        try:
+            result = self.db.execute(self._insert_ignore(rows))
+            written = result.rowcount if result.rowcount is not None and result.rowcount >= 0 else batch_size
+            if commit:
+                self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Bulk article insert failed ({batch_size} rows), retrying row by row: {e}")
+            written = self._insert_rows_individually(rows)
+
+        if written < batch_size:
+            logger.info(f"Article batch: {batch_size - written} rows already existed and were ignored")
+        logger.info(f"Article batch saved: {written}/{batch_size} rows")
+        self.inserted += written
+        return written
+
+    def _insert_ignore(self, rows: list):
+        dialect = self.db.get_bind().dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as pg_insert
+            return pg_insert(Article).values(rows).on_conflict_do_nothing(index_elements=["url", "source_id"])
+        if dialect == "sqlite":
+            return insert(Article).values(rows).prefix_with("OR IGNORE")
+        return insert(Article).values(rows)
+
+    def _insert_rows_individually(self, rows: list) -> int:
+        written = 0
+        for row in rows:
+            try:
+                self.db.execute(insert(Article).values(**row))
+                self.db.commit()
+                written += 1
+            except IntegrityError:
+                self.db.rollback()
+                logger.info(f"Article already exists: {row.get('url')}")
+            except Exception as e:
+                self.db.rollback()
+                logger.error(f"Failed to save article {row.get('url')}: {e}")
+        return written
+
+    @staticmethod
+    def _to_row(article: Article) -> dict:
+        # Every row needs the same keys for a multi-row VALUES clause
+        row = {column.key: getattr(article, column.key) for column in Article.__table__.columns}
+        if not row.get("id"):
+            row["id"] = generate_uuid()
+        if not row.get("scraped_at"):
+            row["scraped_at"] = datetime.now(timezone.utc)
+        if row.get("language") is None:
+            row["language"] = "en"
+        if row.get("relevance_score") is None:
+            row["relevance_score"] = 0
+        return row
@@ -0,0 +1,147 @@
+"""
+Long-lived headless Chromium shared by Visual AI (PDF) crawls.
+
+Playwright objects are bound to the event loop that started them, so there is
+one browser per running loop. Each crawl gets its own isolated context (cookies,
+storage) and the number of concurrently open pages is capped.
+"""
+import asyncio
+import os
+import threading
+import weakref
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+
+from playwright.async_api import async_playwright
+
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+BROWSER_MAX_PAGES = int(os.getenv("BROWSER_MAX_PAGES", "4"))
+DEFAULT_VIEWPORT = {"width": 1280, "height": 1080}
+
+# Heavy resources that don't help the Vision AI read headlines
+DEFAULT_BLOCKED_RESOURCE_TYPES = ["image", "media", "font"]
+
+# Ad, analytics and tracking hosts (subdomains are blocked too)
+DEFAULT_BLOCKED_DOMAINS = [
+    "doubleclick.net", "googlesyndication.com", "googleadservices.com", "google-analytics.com",
+    "googletagmanager.com", "googletagservices.com", "adservice.google.com", "amazon-adsystem.com",
+    "adnxs.com", "criteo.com", "criteo.net", "taboola.com", "outbrain.com", "rubiconproject.com",
+    "pubmatic.com", "openx.net", "casalemedia.com", "scorecardresearch.com", "quantserve.com",
+    "chartbeat.com", "chartbeat.net", "hotjar.com", "facebook.net",
+    "segment.com", "segment.io", "newrelic.com", "nr-data.net", "optimizely.com", "moatads.com",
+]
+
+READY_STATES = ("commit", "domcontentloaded", "load", "networkidle")
+
+
+def _is_blocked_host(host: str, domains: list) -> bool:
+    host = (host or "").lower()
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+
+async def _block_requests(context, resource_types: list, domains: list):
+    """Abort requests for blocked resource types or ad/analytics hosts on every page of the context."""
+    resource_types = set(resource_types or [])
+    domains = [d.lower().lstrip(".") for d in (domains or [])]
+
+    async def handle(route):
+        request = route.request
+        if request.resource_type in resource_types or _is_blocked_host(urlparse(request.url).hostname, domains):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    await context.route("**/*", handle)
+
+
+async def wait_until_ready(page, url: str, wait_until: str = "domcontentloaded", selector: str = None,
+                           settle_ms: int = 3000, timeout_ms: int = 60000):
+    """
+    Navigate and wait for the page to be capture-ready.
+
+    wait_until picks the navigation event; then either wait for `selector` or give
+    the page up to `settle_ms` to go network-idle (a timeout there is not an error).
+    """
+    if wait_until not in READY_STATES:
+        wait_until = "domcontentloaded"
+    await page.goto(url, wait_until=wait_until, timeout=timeout_ms)
+
+    if selector:
+        await page.wait_for_selector(selector, timeout=timeout_ms)
+    elif settle_ms and wait_until != "networkidle":
+        try:
+            await page.wait_for_load_state("networkidle", timeout=settle_ms)
+        except Exception:
+            logger.debug(f"Page did not settle within {settle_ms}ms, capturing anyway: {url}")
+
+
+class BrowserPool:
+    def __init__(self, max_pages: int = BROWSER_MAX_PAGES):
+        self._playwright = None
+        self._browser = None
+        self._launch_lock = asyncio.Lock()
+        self._pages = asyncio.Semaphore(max(1, max_pages))
+
+    async def _get_browser(self):
+        async with self._launch_lock:
+            if self._browser is None or not self._browser.is_connected():
+                if self._playwright is None:
+                    self._playwright = await async_playwright().start()
+                self._browser = await self._playwright.chromium.launch(headless=True)
+                logger.info("Launched shared headless browser")
+            return self._browser
+
+    @asynccontextmanager
+    async def page(self, user_agent: str = None, viewport: dict = None, block_resource_types: list = None, block_domains: list = None):
+        """Open a page in a fresh context; the context is closed when the block exits."""
+        async with self._pages:
+            browser = await self._get_browser()
+            context = await browser.new_context(user_agent=user_agent, viewport=viewport or DEFAULT_VIEWPORT)
+            try:
+                if block_resource_types or block_domains:
+                    await _block_requests(context, block_resource_types, block_domains)
+                yield await context.new_page()
+            finally:
+                try:
+                    await context.close()
+                except Exception as e:
+                    logger.debug(f"Failed to close browser context: {e}")
+
+    async def close(self):
+        async with self._launch_lock:
+            if self._browser is not None:
+                try:
+                    await self._browser.close()
+                except Exception as e:
+                    logger.debug(f"Failed to close browser: {e}")
+                self._browser = None
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+
+
+_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, BrowserPool]" = weakref.WeakKeyDictionary()
+_pools_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """Return the browser pool for the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    with _pools_lock:
+        pool = _pools.get(loop)
+        if pool is None:
+            pool = BrowserPool()
+            _pools[loop] = pool
+    return pool
+
+
+async def close_browser_pool():
+    """Shut down the browser of the running event loop (e.g. on shutdown)."""
+    loop = asyncio.get_running_loop()
+    with _pools_lock:
+        pool = _pools.pop(loop, None)
+    if pool is not None:
+        await pool.close()
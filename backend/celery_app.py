@@ -46,4 +46,12 @@ celery_app.conf.beat_schedule = {
         "task": "tasks.check_scheduled_pipelines",
         "schedule": crontab(minute="*"), # Run every minute
     },
+    "retrain-relevance-filters-hourly": {
+        "task": "tasks.retrain_relevance_filters",
+        "schedule": crontab(minute="17"), # Hourly; each filter retrains once it is a day old
+    },
+    "evict-content-cache-hourly": {
+        "task": "tasks.evict_content_cache",
+        "schedule": crontab(minute="43"), # Hourly; page text expires after a day
+    },
 }
@@ -5,7 +5,7 @@ from datetime import datetime, timedelta, timezone
 import json
 import logging
 from logger_config import setup_logger
-from ai_service import AIService, _strip_json_fences
+from ai_service import get_ai_service, _strip_json_fences
 
 logger = setup_logger(__name__)
 
@@ -132,7 +132,7 @@ def analyze_clusters(db: Session, user_id: str, api_key: str, event_id: str = No
             logger.error(f"No API Key provided for user {user_id}")
             return {"status": "error", "message": "No API Key"}
 
-        ai_service = AIService(api_key=api_key, anthropic_api_key=anthropic_api_key)
+        ai_service = get_ai_service(api_key=api_key, anthropic_api_key=anthropic_api_key)
         
         # 2. Fetch Active Stories (Configurable Context)
         since_date = datetime.now(timezone.utc) - timedelta(days=context_days)
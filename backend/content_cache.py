@@ -0,0 +1,170 @@
+"""
+Shared, tenant-neutral cache for crawled content.
+
+Article rows stay per source, but the expensive parts of ingesting an article
+are the same for every tenant that follows the outlet:
+
+- page_text: the extracted full text of a URL (fresh for PAGE_TEXT_TTL_HOURS)
+- analysis:  the analyze_article result for (canonical URL, content hash,
+             analysis prompt + topic focus, model)
+
+Relevance thresholds are still applied per source by the crawler.
+"""
+import hashlib
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import ContentCache, generate_uuid
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+PAGE_TEXT_TTL_HOURS = int(os.getenv("CONTENT_CACHE_TEXT_TTL_HOURS", "24"))
+ANALYSIS_TTL_DAYS = int(os.getenv("CONTENT_CACHE_ANALYSIS_TTL_DAYS", "30"))
+
+# Only names that never identify content: some CMSs use e.g. `cid` or `ref` as the article id
+TRACKING_PARAMS = {'fbclid', 'gclid', 'dclid', 'msclkid', 'mc_cid', 'mc_eid', 'cmpid', 'ocid', 'ref_src', 'smid'}
+
+
+def canonical_url(url: str) -> str:
+    """Lower-cased host without www/default port/fragment, tracking parameters dropped, query sorted."""
+    parsed = urlparse((url or '').strip())
+    scheme = (parsed.scheme or 'http').lower()
+    host = (parsed.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    if parsed.port and (scheme, parsed.port) not in (('http', 80), ('https', 443)):
+        host = f"{host}:{parsed.port}"
+
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+        if not k.lower().startswith('utm_') and k.lower() not in TRACKING_PARAMS
+    )
+    path = parsed.path.rstrip('/') or '/'
+    return urlunparse((scheme, host, path, '', urlencode(query), ''))
+
+
+def content_hash(*parts: str) -> str:
+    """Whitespace-insensitive hash of the text the model sees."""
+    normalized = '\n'.join(re.sub(r'\s+', ' ', part or '').strip() for part in parts)
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def _cache_key(*parts: str) -> str:
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+def _lookup(db: Session, key: str, max_age: timedelta):
+    entry = db.query(ContentCache).filter(ContentCache.cache_key == key).first()
+    if entry is None:
+        return None
+    created = entry.created_at
+    if created is not None:
+        if created.tzinfo is None:
+            created = created.replace(tzinfo=timezone.utc)
+        if created < datetime.now(timezone.utc) - max_age:
+            return None
+    return entry
+
+
+def _store(key: str, kind: str, url: str, payload, model: str = None):
+    """
+    Insert or refresh an entry in its own short transaction. Never through the crawl's session:
+    that one stays open across HTTP and LLM awaits, and concurrent crawls would wait on its locks.
+    """
+    db = SessionLocal()
+    try:
+        existing = db.query(ContentCache).filter(ContentCache.cache_key == key).first()
+        if existing is not None:
+            existing.payload = payload
+            existing.created_at = datetime.now(timezone.utc)
+            db.commit()
+            return
+        # Concurrent crawls of the same URL may race; whoever inserts first wins
+        values = dict(
+            id=generate_uuid(), cache_key=key, kind=kind, canonical_url=url, model=model,
+            payload=payload, created_at=datetime.now(timezone.utc)
+        )
+        dialect = db.get_bind().dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as pg_insert
+            stmt = pg_insert(ContentCache).values(**values).on_conflict_do_nothing(index_elements=["cache_key"])
+        elif dialect == "sqlite":
+            stmt = insert(ContentCache).values(**values).prefix_with("OR IGNORE")
+        else:
+            stmt = insert(ContentCache).values(**values)
+        db.execute(stmt)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Content cache write failed for {url}: {e}")
+    finally:
+        db.close()
+
+
+def get_page_text(db: Session, url: str):
+    """Cached extracted text for the URL, or None."""
+    canonical = canonical_url(url)
+    entry = _lookup(db, _cache_key('page_text', canonical), timedelta(hours=PAGE_TEXT_TTL_HOURS))
+    if entry is None:
+        return None
+    logger.debug(f"Content cache hit (page text): {canonical}")
+    return (entry.payload or {}).get('text')
+
+
+def put_page_text(url: str, text: str):
+    canonical = canonical_url(url)
+    _store(_cache_key('page_text', canonical), 'page_text', canonical, {'text': text})
+
+
+def analysis_key(url: str, title: str, text: str, prompt: str, model: str) -> str:
+    return _cache_key('analysis', canonical_url(url), content_hash(title, text), content_hash(prompt), model or '')
+
+
+def get_analysis(db: Session, url: str, title: str, text: str, prompt: str, model: str):
+    """Cached analyze_article result for this exact content, prompt and model, or None."""
+    entry = _lookup(db, analysis_key(url, title, text, prompt, model), timedelta(days=ANALYSIS_TTL_DAYS))
+    if entry is None:
+        return None
+    logger.info(f"Content cache hit (analysis): {entry.canonical_url}")
+    return dict(entry.payload or {})
+
+
+def get_analysis_by_key(db: Session, key: str):
+    """Cached analysis by its cache key (e.g. the first copy of a near-duplicate), or None."""
+    entry = _lookup(db, key, timedelta(days=ANALYSIS_TTL_DAYS))
+    return dict(entry.payload or {}) if entry is not None else None
+
+
+def put_analysis(url: str, title: str, text: str, prompt: str, model: str, result: dict):
+    if not result:
+        return
+    _store(analysis_key(url, title, text, prompt, model), 'analysis', canonical_url(url), result, model=model)
+
+
+def evict(db: Session, now: datetime = None) -> int:
+    """Delete entries past their TTL (reads skip them, but nothing else removes them); returns how many."""
+    now = now or datetime.now(timezone.utc)
+    try:
+        removed = db.query(ContentCache).filter(
+            ContentCache.kind == 'page_text',
+            ContentCache.created_at < now - timedelta(hours=PAGE_TEXT_TTL_HOURS)
+        ).delete(synchronize_session=False)
+        removed += db.query(ContentCache).filter(
+            ContentCache.kind == 'analysis',
+            ContentCache.created_at < now - timedelta(days=ANALYSIS_TTL_DAYS)
+        ).delete(synchronize_session=False)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Content cache eviction failed: {e}")
+        return 0
+    if removed:
+        logger.info(f"Content cache evicted {removed} entries")
+    return removed
@@ -0,0 +1,122 @@
+"""
+Crawl engine that runs a batch of sources concurrently in one event loop.
+
+Crawling is mostly waiting on network and LLM I/O, so a single Celery worker can
+keep dozens of sources in flight. Each source gets its own DB session and
+CrawlerService; concurrency is capped globally and per publisher domain.
+"""
+import asyncio
+import os
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import Source, CrawlEvent, generate_uuid
+from crawler import CrawlerService
+from crawl_scheduler import record_crawl_failure
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+CRAWL_ENGINE_CONCURRENCY = int(os.getenv("CRAWL_ENGINE_CONCURRENCY", "20"))
+CRAWL_PER_DOMAIN_CONCURRENCY = int(os.getenv("CRAWL_PER_DOMAIN_CONCURRENCY", "2"))
+CRAWL_SOURCE_TIMEOUT_SECONDS = int(os.getenv("CRAWL_SOURCE_TIMEOUT_SECONDS", "900"))
+# Half-open circuit probes get a shorter leash so a dead source can't hold a slot for the full timeout.
+# Only probes: a healthy crawl (host pacing, PDF capture, AI batches) can take several minutes.
+CRAWL_PROBE_TIMEOUT_SECONDS = int(os.getenv("CRAWL_PROBE_TIMEOUT_SECONDS", "300"))
+
+
+def source_domain(url: str) -> str:
+    host = (urlparse(url or "").hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+class CrawlEngine:
+    def __init__(self, max_concurrency: int = CRAWL_ENGINE_CONCURRENCY,
+                 per_domain_concurrency: int = CRAWL_PER_DOMAIN_CONCURRENCY,
+                 source_timeout: int = CRAWL_SOURCE_TIMEOUT_SECONDS):
+        self.global_limit = asyncio.Semaphore(max(1, max_concurrency))
+        self.per_domain_concurrency = max(1, per_domain_concurrency)
+        self.domain_limits: dict = {}
+        self.source_timeout = source_timeout
+
+    def _domain_limit(self, domain: str) -> asyncio.Semaphore:
+        if domain not in self.domain_limits:
+            self.domain_limits[domain] = asyncio.Semaphore(self.per_domain_concurrency)
+        return self.domain_limits[domain]
+
+    async def crawl_sources(self, source_ids: list) -> dict:
+        """Crawl all sources concurrently. Returns {"crawled": n, "failed": n}."""
+        db: Session = SessionLocal()
+        try:
+            rows = db.query(Source.id, Source.url, Source.crawl_state).filter(Source.id.in_(source_ids)).all()
+        finally:
+            db.close()
+
+        urls = {row.id: row.url for row in rows}
+        probes = {row.id for row in rows if (row.crawl_state or {}).get('circuit') == 'half_open'}
+        missing = set(source_ids) - set(urls)
+        if missing:
+            logger.warning(f"Crawl batch: {len(missing)} sources no longer exist, skipping")
+
+        logger.info(f"Crawl batch started: {len(urls)} sources")
+        results = await asyncio.gather(
+            *(self._crawl_one(source_id, urls[source_id], self._timeout_for(source_id in probes))
+              for source_id in source_ids if source_id in urls)
+        )
+        summary = {"crawled": sum(1 for ok in results if ok), "failed": sum(1 for ok in results if not ok)}
+        logger.info(f"Crawl batch finished: {summary}")
+        return summary
+
+    def _timeout_for(self, probe: bool) -> int:
+        return min(self.source_timeout, CRAWL_PROBE_TIMEOUT_SECONDS) if probe else self.source_timeout
+
+    async def _crawl_one(self, source_id: str, url: str, timeout: int) -> bool:
+        async with self.global_limit, self._domain_limit(source_domain(url)):
+            db: Session = SessionLocal()
+            try:
+                crawler = CrawlerService(db)
+                await asyncio.wait_for(crawler.crawl_source_async(source_id), timeout=timeout)
+                return True
+            except asyncio.TimeoutError:
+                logger.error(f"Crawl timed out after {timeout}s for {url}")
+                db.rollback()
+                self._mark_failed(db, source_id)
+                return False
+            except Exception as e:
+                logger.error(f"Crawl engine error for {url}: {e}")
+                db.rollback()
+                self._mark_failed(db, source_id)
+                return False
+            finally:
+                db.close()
+
+    @staticmethod
+    def _mark_failed(db: Session, source_id: str):
+        """Record a failure for crawls that never reached crawl_source_async's own error handling."""
+        try:
+            source = db.query(Source).filter(Source.id == source_id).first()
+            if not source:
+                return
+            source.status = 'error'
+            source.last_crawled_at = datetime.now(timezone.utc)
+            record_crawl_failure(source)
+            db.add(CrawlEvent(id=generate_uuid(), source_id=source_id, status='error', articles_count=0))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to record crawl failure for {source_id}: {e}")
+
+
+def run_crawl_batch(source_ids: list) -> dict:
+    # Wrapper to run the engine synchronously (Celery); reuses the worker's loop
+    # so pooled HTTP connections and the browser survive between batches.
+    try:
+        loop = asyncio.get_event_loop()
+    except RuntimeError:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+    return loop.run_until_complete(CrawlEngine().crawl_sources(source_ids))
@@ -0,0 +1,204 @@
+"""
+Adaptive crawl scheduling.
+
+`Source.crawl_interval` is the configured base. After each crawl the interval is
+re-derived from the source's recent CrawlEvent history:
+
+- how often a crawl finds anything (productive rate) and how much it finds,
+- how productive this time of day has been over the last two weeks,
+
+and clamped to per-source bounds. The result is kept in
+`crawl_state["adaptive_interval_mins"]`; the scheduler uses it instead of the
+base interval.
+
+Failing sources back off exponentially (`crawl_state["retry_at"]`). After
+CIRCUIT_FAILURE_THRESHOLD consecutive failures the circuit opens: the source is
+parked until its retry time, then a single half-open probe decides whether it
+closes again or stays parked for longer.
+"""
+import os
+import random
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.orm import Session
+
+from models import Source, CrawlEvent
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_CRAWL_INTERVAL_MINS = 15
+MIN_INTERVAL_FLOOR_MINS = 5
+MAX_INTERVAL_CEILING_MINS = 24 * 60
+HISTORY_DAYS = 14
+RECENT_CRAWLS = 12  # Window for the productive rate
+MIN_HISTORY = 3  # Below this we keep the base interval
+HIGH_YIELD_ARTICLES = 5  # Productive crawls this large mean articles pile up between polls
+
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CRAWL_CIRCUIT_FAILURE_THRESHOLD", "5"))
+MAX_BACKOFF_MINS = int(os.getenv("CRAWL_MAX_BACKOFF_MINS", str(24 * 60)))
+PROBE_WINDOW_MINS = 60
+
+
+def _aware(dt: datetime) -> datetime:
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt
+
+
+def base_interval(source: Source) -> int:
+    return source.crawl_interval or DEFAULT_CRAWL_INTERVAL_MINS
+
+
+def interval_bounds(source: Source) -> tuple:
+    """(min, max) minutes; source config `min_crawl_interval` / `max_crawl_interval` override."""
+    config = source.config or {}
+    base = base_interval(source)
+    low = config.get('min_crawl_interval') or max(MIN_INTERVAL_FLOOR_MINS, base / 4)
+    high = config.get('max_crawl_interval') or min(MAX_INTERVAL_CEILING_MINS, base * 4)
+    return float(low), float(max(low, high))
+
+
+def current_interval(source: Source) -> float:
+    """Minutes between crawls: the adaptive interval when enabled and known, else the base."""
+    config = source.config or {}
+    if config.get('adaptive_interval', True):
+        adaptive = (source.crawl_state or {}).get('adaptive_interval_mins')
+        if adaptive:
+            return float(adaptive)
+    return float(base_interval(source))
+
+
+def next_crawl_at(source: Source):
+    """When the source is next due, or None if it has never been crawled (due now)."""
+    retry_at = (source.crawl_state or {}).get('retry_at')
+    if retry_at:
+        return _aware(datetime.fromisoformat(retry_at))
+    if not source.last_crawled_at:
+        return None
+    return _aware(source.last_crawled_at) + timedelta(minutes=current_interval(source))
+
+
+def _time_of_day_factor(events: list, at: datetime) -> float:
+    """
+    >1 when crawls around this hour (UTC, +-1h) have historically found less than average,
+    <1 when they found more. Neutral without enough history.
+    """
+    total_articles = sum(e.articles_count or 0 for e in events)
+    if total_articles < 10:
+        return 1.0
+
+    hours = {(at.hour + offset) % 24 for offset in (-1, 0, 1)}
+    window = [e for e in events if e.created_at and _aware(e.created_at).hour in hours]
+    if len(window) < MIN_HISTORY:
+        return 1.0
+
+    overall = total_articles / len(events)
+    in_window = sum(e.articles_count or 0 for e in window) / len(window)
+    if in_window <= 0:
+        return 2.0
+    return min(2.0, max(0.5, overall / in_window))
+
+
+def compute_adaptive_interval(source: Source, events: list, now: datetime) -> float:
+    """Interval in minutes from non-error events (newest first), within the source's bounds."""
+    low, high = interval_bounds(source)
+    base = base_interval(source)
+    if len(events) < MIN_HISTORY:
+        return min(high, max(low, base))
+
+    recent = events[:RECENT_CRAWLS]
+    productive = [e for e in recent if (e.articles_count or 0) > 0]
+    productive_rate = len(productive) / len(recent)
+
+    # Every crawl finds something -> poll up to 2x faster; never finds anything -> up to 2x slower
+    factor = 2 ** (2 * (0.5 - productive_rate))
+    if productive and sum(e.articles_count for e in productive) / len(productive) >= HIGH_YIELD_ARTICLES:
+        factor *= 0.75
+
+    interval = base * factor
+    interval *= _time_of_day_factor(events, now + timedelta(minutes=interval))
+    return round(min(high, max(low, interval)), 1)
+
+
+def update_adaptive_interval(db: Session, source: Source, now: datetime = None):
+    """Recompute the source's interval from its history; the caller commits."""
+    if not (source.config or {}).get('adaptive_interval', True):
+        return
+    now = now or datetime.now(timezone.utc)
+    events = db.query(CrawlEvent).filter(
+        CrawlEvent.source_id == source.id,
+        CrawlEvent.status != 'error',
+        CrawlEvent.created_at >= now - timedelta(days=HISTORY_DAYS)
+    ).order_by(CrawlEvent.created_at.desc()).limit(500).all()
+    if len(events) < MIN_HISTORY:
+        return
+
+    interval = compute_adaptive_interval(source, events, now)
+    previous = (source.crawl_state or {}).get('adaptive_interval_mins')
+    if interval != previous:
+        logger.info(f"Adaptive interval for {source.name or source.url}: {previous or base_interval(source)} -> {interval} min")
+        source.crawl_state = {**(source.crawl_state or {}), 'adaptive_interval_mins': interval}
+
+
+def circuit_state(source: Source) -> str:
+    return (source.crawl_state or {}).get('circuit') or 'closed'
+
+
+def record_crawl_failure(source: Source, now: datetime = None):
+    """Back off exponentially from the base interval; open the circuit after repeated failures."""
+    now = now or datetime.now(timezone.utc)
+    state = dict(source.crawl_state or {})
+    failures = state.get('consecutive_failures', 0) + 1
+
+    # Jitter keeps sources that failed together (e.g. one outage) from retrying together
+    backoff = min(MAX_BACKOFF_MINS, base_interval(source) * 2 ** (failures - 1)) * random.uniform(0.9, 1.1)
+    circuit = 'open' if failures >= CIRCUIT_FAILURE_THRESHOLD or state.get('circuit') == 'half_open' else 'closed'
+    if circuit == 'open':
+        logger.warning(f"Circuit open for {source.name or source.url} after {failures} failures; next probe in {backoff:.0f} min")
+    else:
+        logger.info(f"Backing off {source.name or source.url} for {backoff:.0f} min (failure {failures})")
+
+    state.update({
+        'consecutive_failures': failures,
+        'circuit': circuit,
+        'retry_at': (now + timedelta(minutes=backoff)).isoformat(),
+    })
+    source.crawl_state = state
+
+
+def record_crawl_success(source: Source):
+    """Close the circuit and clear the backoff."""
+    state = source.crawl_state or {}
+    if not any(key in state for key in ('consecutive_failures', 'circuit', 'retry_at')):
+        return
+    if state.get('circuit') in ('open', 'half_open'):
+        logger.info(f"Circuit closed for {source.name or source.url}: probe succeeded")
+    source.crawl_state = {k: v for k, v in state.items() if k not in ('consecutive_failures', 'circuit', 'retry_at')}
+
+
+def begin_probe(source: Source, now: datetime = None):
+    """Let a single trial crawl through an open circuit; its outcome closes or re-opens it."""
+    now = now or datetime.now(timezone.utc)
+    logger.info(f"Half-open probe for {source.name or source.url}")
+    source.crawl_state = {
+        **(source.crawl_state or {}),
+        'circuit': 'half_open',
+        # Not due again while the probe is queued; if it never runs, probe again after the window
+        'retry_at': (now + timedelta(minutes=PROBE_WINDOW_MINS)).isoformat(),
+    }
+
+
+def claim_crawl(source: Source, now: datetime = None):
+    """
+    Mark a source as dispatched. It stays 'crawling' while it waits for an engine slot, so
+    later schedule checks don't queue it again.
+    """
+    now = now or datetime.now(timezone.utc)
+    source.status = 'crawling'
+    source.crawl_state = {**(source.crawl_state or {}), 'claimed_at': now.isoformat()}
+
+
+def crawling_since(source: Source):
+    """Latest of the dispatch claim and the last crawl, for spotting stuck crawls; None if neither is known."""
+    claimed = (source.crawl_state or {}).get('claimed_at')
+    times = [_aware(t) for t in (source.last_crawled_at, claimed and datetime.fromisoformat(claimed)) if t]
+    return max(times) if times else None
@@ -2,18 +2,29 @@ import logging
 import asyncio
 from datetime import datetime, timedelta, timezone
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
 from database import SessionLocal
 from models import Source, Article, CrawlEvent, generate_uuid, SystemConfig, User
-from playwright.async_api import async_playwright
-import trafilatura
 from bs4 import BeautifulSoup
 import httpx
-from ai_service import AIService, normalize_metadata
+from article_writer import ArticleBatchWriter, DEFAULT_BATCH_SIZE
+from browser_pool import get_browser_pool, wait_until_ready, DEFAULT_BLOCKED_RESOURCE_TYPES, DEFAULT_BLOCKED_DOMAINS
+from http_client import get_http_client, request_timeout
+from politeness import polite_get, host_limiter, PolitenessBudgetExceeded
+from crawl_scheduler import update_adaptive_interval, record_crawl_success, record_crawl_failure
+from link_extractor import extract_link_candidates, format_candidates_for_prompt, learn_recipe, apply_recipe, recipe_is_valid
+from ai_service import get_ai_service, normalize_metadata
+import content_cache
+import near_duplicates
+import relevance_filter
+import language_id
+import text_cleaning
+import enrichment_profiles
 from zoneinfo import ZoneInfo
 from urllib.parse import urlparse
 from logger_config import setup_logger
 import time
+import hashlib
+import re
 
 DEFAULT_PDF_CRAWL_PROMPT = """
 You are a specialized news extraction engine. Analyze this web page snapshot.
@@ -34,10 +45,30 @@ Return ONLY a JSON list of these objects.
 # Configure logging
 logger = setup_logger(__name__)
 
+# JS used to read the visible text of the main page region for change detection
+PAGE_TEXT_SCRIPT = """(sel) => {
+    const el = (sel && document.querySelector(sel)) || document.querySelector('main') || document.body;
+    return el ? el.innerText : '';
+}"""
+
+def page_text_fingerprint(text: str) -> list:
+    """
+    Sorted short hashes of the headline-sized lines of a rendered page.
+    Digits are dropped so clocks and relative times ('5 min ago') don't count as changes.
+    """
+    hashes = set()
+    for line in (text or '').splitlines():
+        line = re.sub(r'\d+', '', line.lower())
+        line = re.sub(r'\s+', ' ', line).strip()
+        if len(line) >= 20:
+            hashes.add(hashlib.sha1(line.encode('utf-8')).hexdigest()[:10])
+    return sorted(hashes)
+
 class CrawlerService:
     def __init__(self, db: Session):
         self.db = db
-        self.ai = AIService()
+        self.ai = get_ai_service()
+        self.force = False
         
         # Load System Config
         self.sys_config = self.db.query(SystemConfig).first()
@@ -55,7 +86,8 @@ class CrawlerService:
             'max_articles': 'max_articles_to_scrape',
             'timeout': 'page_load_timeout_seconds',
             'min_relevance': 'min_relevance_score',
-            'lookback': 'first_crawl_lookback_hours'
+            'lookback': 'first_crawl_lookback_hours',
+            'enrichment_profile': 'enrichment_profile'
         }
         
         if key in sys_map:
@@ -64,7 +96,8 @@ class CrawlerService:
              
         return default
 
-    async def crawl_source_async(self, source_id: str, on_progress=None):
+    async def crawl_source_async(self, source_id: str, on_progress=None, force: bool = False):
+        """`force` ignores the previous crawl's validators and fingerprints (manual "crawl now")."""
         source = self.db.query(Source).filter(Source.id == source_id).first()
         if not source:
             logger.error(f"Source {source_id} not found")
@@ -88,12 +121,15 @@ class CrawlerService:
         user_anthropic_key = getattr(user, 'anthropic_api_key', None) if user else None
 
         # 3. Initialize AI Service with User's Keys
-        self.ai = AIService(api_key=user_api_key, anthropic_api_key=user_anthropic_key)
+        self.ai = get_ai_service(api_key=user_api_key, anthropic_api_key=user_anthropic_key)
         # ----------------------------------------
         
         # Store source for use in helper methods
         self.current_source = source
         self.current_source_config = source.config if source.config else {}
+        self.pending_crawl_state = {}
+        self.force = force
+        self.article_writer = ArticleBatchWriter(self.db, batch_size=int(self._get_config(source, 'write_batch_size', DEFAULT_BATCH_SIZE)))
         
         # Log Topic Focus
         topic_focus = self.sys_config.content_topic_focus if self.sys_config else "Economics, Trade, Politics, or Finance"
@@ -112,24 +148,41 @@ class CrawlerService:
                 if on_progress: await on_progress("Starting Smart HTML crawl...")
                 stats = await self._crawl_html_async(source, on_progress=on_progress)
             
+            if stats.get('status') == 'error':
+                raise RuntimeError(stats.get('message') or "Crawl reported an error")
+            
             # Success
             source.last_crawled_at = datetime.now(timezone.utc)
             source.status = 'active'
+            if self.pending_crawl_state and stats.get('status') == 'success':
+                # Validators are only stored after a full crawl so failed crawls are retried in full
+                source.crawl_state = {**(source.crawl_state or {}), **self.pending_crawl_state}
+            
+            not_modified = stats.get('status') == 'not_modified'
+            if not_modified:
+                logger.info(f"Source not modified since last crawl: {source.url}")
+                if on_progress: await on_progress("Source not modified since last crawl. Skipping.", {"status": "success"})
             
             # Log Event
             log = CrawlEvent(
                 id=generate_uuid(),
                 source_id=source.id,
-                status='success',
+                status='not_modified' if not_modified else 'success',
                 articles_count=stats['articles']
             )
             self.db.add(log)
+            self.db.flush()
+            record_crawl_success(source)
+            update_adaptive_interval(self.db, source)
             self.db.commit()
             
         except Exception as e:
             logger.error(f"Crawl failed for {source.url}: {e}")
+            # Keep articles that were already analyzed before the failure
+            self.article_writer.flush(commit=False)
             source.status = 'error'
-            source.last_crawled_at = datetime.now(timezone.utc) # Update time to prevent immediate retry loop
+            source.last_crawled_at = datetime.now(timezone.utc)
+            record_crawl_failure(source) # Exponential backoff / circuit breaker instead of retrying at full cadence
             
             # Log Failure
             log = CrawlEvent(
@@ -143,6 +196,20 @@ class CrawlerService:
 
     def _is_valid_article(self, title: str, text: str, date: datetime, last_crawled_at: datetime = None) -> tuple[bool, str]:
         # 1. Date Filter
+        is_recent, reason = self._is_recent(date, last_crawled_at)
+        if not is_recent:
+            return False, reason
+
+        # 2. Length Filter
+        min_length = self._get_config(self.current_source, 'min_length', 200)
+        curr_len = len(text) if text else 0
+        if curr_len < min_length:
+            return False, f"Content too short ({curr_len} < {min_length} chars)"
+            
+        return True, "Valid"
+
+    def _is_recent(self, date: datetime, last_crawled_at: datetime = None) -> tuple[bool, str]:
+        """Date part of _is_valid_article; RSS entries are checked before their pages are fetched."""
         if date:
             d_aware = date
             if d_aware.tzinfo is None: 
@@ -164,71 +231,346 @@ class CrawlerService:
                     return False, f"Older than {lookback}h lookback ({d_aware.strftime('%Y-%m-%d %H:%M')})"
         else:
             return False, "No publication date found"
-
-        # 2. Length Filter
-        min_length = self._get_config(self.current_source, 'min_length', 200)
-        curr_len = len(text) if text else 0
-        if curr_len < min_length:
-            return False, f"Content too short ({curr_len} < {min_length} chars)"
-            
         return True, "Valid"
+
+    @staticmethod
+    def _selected_ids(selection: list) -> set:
+        """Candidate ids chosen by the model (accepts [3, 4] or [{"id": 3}, ...])."""
+        ids = set()
+        for choice in selection:
+            cid = choice.get('id') if isinstance(choice, dict) else choice
+            try:
+                ids.add(int(cid))
+            except (TypeError, ValueError):
+                continue
+        return ids
+
+    @staticmethod
+    def _candidate_item(candidate: dict) -> dict:
+        return {k: candidate[k] for k in ('headline', 'url', 'snippet', 'date')}
+
+    def _store_recipe(self, source: Source, recipe):
+        config = dict(source.config or {})
+        if recipe:
+            recipe['learned_at'] = datetime.now(timezone.utc).isoformat()
+            config['extraction_recipe'] = recipe
+            logger.info(f"Learned extraction recipe for {source.url}: {recipe['link_patterns']}")
+        elif 'extraction_recipe' in config:
+            # Selection no longer fits clean patterns; keep using the AI until it does
+            del config['extraction_recipe']
+        else:
+            return
+        source.config = config
+
+    def _existing_values(self, source: Source, column, values: list) -> set:
+        """Return which of `values` already exist in `column` for this source, using one IN query per chunk."""
+        candidates = list({v for v in values if v and isinstance(v, str)})
+        existing = set()
+        # Chunked to stay under SQLite's bound-parameter limit
+        for i in range(0, len(candidates), 500):
+            chunk = candidates[i:i + 500]
+            rows = self.db.query(column).filter(
+                Article.source_id == source.id,
+                column.in_(chunk)
+            ).all()
+            existing.update(row[0] for row in rows)
+        return existing
+
+    async def _conditional_get(self, client: httpx.AsyncClient, source: Source, timeout=None):
+        """
+        GET the source URL with the validators from the previous crawl.
+        Returns None on a 304 or when the body hash is unchanged.
+        """
+        state = source.crawl_state or {}
+        use_validators = self._get_config(source, 'conditional_get', True) and not self.force
+        
+        headers = {}
+        if use_validators:
+            if state.get('etag'):
+                headers['If-None-Match'] = state['etag']
+            if state.get('last_modified'):
+                headers['If-Modified-Since'] = state['last_modified']
+        
+        response = await polite_get(client, source.url, headers=headers, timeout=timeout)
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        
+        content_hash = hashlib.sha256(response.content).hexdigest()
+        if use_validators and content_hash == state.get('content_hash'):
+            return None
+        
+        self.pending_crawl_state.update({
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'content_hash': content_hash,
+        })
+        return response
+
+    async def _fetch_full_text(self, client: httpx.AsyncClient, url: str, semaphore: asyncio.Semaphore, timeout=None, deadline: float = None) -> str:
+        """
+        Download an entry page on the shared client and extract its text off the event loop.
+        Gives up ('' = use the feed summary) when the host's next polite slot is after `deadline` (monotonic).
+        """
+        cached = content_cache.get_page_text(self.db, url)
+        if cached is not None:
+            return cached
+
+        async with semaphore:
+            try:
+                max_wait = None if deadline is None else deadline - time.monotonic()
+                resp = await polite_get(client, url, max_wait=max_wait, timeout=timeout)
+                resp.raise_for_status()
+                downloaded = resp.text
+            except PolitenessBudgetExceeded as e:
+                logger.info(f"Politeness budget spent, using the feed summary for {url} ({e})")
+                return ""
+            except Exception as e:
+                logger.debug(f"Full-text fetch failed for {url}: {e}")
+                return ""
+
+        try:
+            # Extraction is CPU-bound, keep it off the event loop
+            text = await asyncio.to_thread(text_cleaning.extract_page_text, downloaded)
+            if text:
+                text = text[:1000] + "..." if len(text) > 1000 else text
+                content_cache.put_page_text(url, text)
+                return text
+        except Exception as e:
+            logger.debug(f"Full-text extraction failed for {url}: {e}")
+        return ""
+
+    async def _enrich_many(self, items: list, default_model: str = "gemini-2.0-flash-lite", on_progress=None) -> list:
+        """
+        Enrich validated articles, given as (url, title, text) tuples; returns one dict per item.
+
+        Shared content cache and near-duplicate hits are reused; the rest go to the LLM in
+        batches of `enrichment_batch_size` (1 = one call per article).
+        """
+        topic_focus = self.sys_config.content_topic_focus if self.sys_config else "Economics, Trade, Politics, or Finance"
+        analysis_model = self.sys_config.analysis_model if self.sys_config else default_model
+        analysis_prompt = self.sys_config.analysis_prompt if self.sys_config else None
+        profile = self._get_config(self.current_source, 'enrichment_profile', enrichment_profiles.DEFAULT_PROFILE)
+        cache_prompt = f"{analysis_prompt or enrichment_profiles.build_prompt(profile)}\n{topic_focus}"
+        scope = near_duplicates.analysis_scope(cache_prompt, analysis_model)
+        detect_duplicates = bool(analysis_model) and self._get_config(self.current_source, 'near_duplicate_detection', True)
+
+        results = [None] * len(items)
+        fingerprints = {}
+        aliases = {}  # index -> index of an earlier near-duplicate copy in this crawl
+        pending = []
+        for i, (url, title, text) in enumerate(items):
+            cached = content_cache.get_analysis(self.db, url, title, text, cache_prompt, analysis_model) if analysis_model else None
+            if cached is not None:
+                results[i] = cached
+                continue
+
+            # Republished wire copies: reuse the enrichment of the first copy we analyzed
+            if detect_duplicates:
+                fingerprint = near_duplicates.simhash(f"{title}\n{text}")
+                if fingerprint is not None:
+                    original = near_duplicates.find_near_duplicate(self.db, fingerprint, scope)
+                    reused = content_cache.get_analysis_by_key(self.db, original.analysis_key) if original is not None else None
+                    if reused is not None:
+                        logger.info(f"[NEAR-DUPLICATE] '{title}' matches {original.canonical_url}; reusing its enrichment")
+                        results[i] = reused
+                        continue
+                    twin = next((j for j in pending if j in fingerprints and
+                                 near_duplicates.hamming(fingerprint, fingerprints[j]) <= near_duplicates.MAX_DISTANCE), None)
+                    if twin is not None:
+                        logger.info(f"[NEAR-DUPLICATE] '{title}' matches '{items[twin][1]}' in this crawl; reusing its enrichment")
+                        aliases[i] = twin
+                        continue
+                    fingerprints[i] = fingerprint
+            pending.append(i)
+
+        # Items our own model is confident are off topic never reach the LLM
+        if pending and self._get_config(self.current_source, 'local_relevance_filter', True):
+            pending = self._local_prefilter(items, pending, results, topic_focus)
+        # Only decisions the AI makes in this crawl become training labels (not cache or duplicate reuse)
+        ai_decided = set(pending)
+
+        # Two-stage mode: a cheap relevance call first; only articles that pass get the full analysis
+        if pending and analysis_model and self._get_config(self.current_source, 'two_stage_enrichment', False):
+            pending = await self._relevance_gate(items, pending, results, topic_focus, analysis_model, on_progress)
+
+        batch_size = max(1, int(self._get_config(self.current_source, 'enrichment_batch_size', 5)))
+        if pending and on_progress:
+            await on_progress(f"Analyzing {len(pending)} articles ({batch_size} per AI request)...")
+
+        # Articles already in English skip the translation part (custom prompts decide for themselves)
+        english = set()
+        if not analysis_prompt and self._get_config(self.current_source, 'skip_translation', True):
+            english = {i for i in pending if language_id.is_language(f"{items[i][1]}\n{items[i][2]}", 'en')}
+            if english:
+                logger.info(f"{len(english)}/{len(pending)} articles detected as English; analyzing without translation")
+
+        chunks = []
+        for group, translate in (([i for i in pending if i not in english], True), ([i for i in pending if i in english], False)):
+            chunks += [(group[start:start + batch_size], translate) for start in range(0, len(group), batch_size)]
+
+        for chunk, translate in chunks:
+            try:
+                analyses = await self.ai.analyze_articles_batch(
+                    [{"id": str(i), "title": items[i][1], "text": items[i][2]} for i in chunk],
+                    topic_focus,
+                    model_name=analysis_model,
+                    custom_prompt=analysis_prompt,
+                    translate=translate,
+                    profile=profile
+                )
+            except Exception as ai_err:
+                logger.error(f"AI Analysis failed for {len(chunk)} articles: {ai_err}")
+                if on_progress: await on_progress(f"AI Failed: {ai_err}", {"status": "error"})
+                analyses = {}
+
+            for i in chunk:
+                url, title, text = items[i]
+                ai_data = analyses.get(str(i)) or {}
+                results[i] = ai_data
+                content_cache.put_analysis(url, title, text, cache_prompt, analysis_model, ai_data)
+                if i in fingerprints and ai_data:
+                    near_duplicates.index_fingerprint(
+                        fingerprints[i], scope,
+                        content_cache.analysis_key(url, title, text, cache_prompt, analysis_model),
+                        content_cache.canonical_url(url)
+                    )
+
+        for i, twin in aliases.items():
+            results[i] = results[twin]
+
+        # AI rejections are the local filter's negative examples
+        min_relevance = self._get_config(self.current_source, 'min_relevance', 50)
+        rejections = [
+            (url, title, text, ai_data.get('relevance_score'))
+            for i, ((url, title, text), ai_data) in enumerate(zip(items, results))
+            if i in ai_decided and ai_data and
+            (ai_data.get('is_relevant', True) is False or ai_data.get('relevance_score', 0) < min_relevance)
+        ]
+        if rejections:
+            relevance_filter.record_rejections(self.current_source.user_id, topic_focus, rejections)
+        return [result or {} for result in results]
+
+    def _local_prefilter(self, items: list, pending: list, results: list, topic_focus: str) -> list:
+        """Drop pending items the user's local relevance model rejects; returns the rest."""
+        model = relevance_filter.load(self.db, self.current_source.user_id, topic_focus)
+        if model is None:
+            return pending
+        threshold = float(self._get_config(self.current_source, 'local_relevance_threshold', relevance_filter.DEFAULT_THRESHOLD))
+
+        passed = []
+        for i in pending:
+            rejected, probability = model.rejects(items[i][1], items[i][2], threshold)
+            if rejected:
+                logger.info(f"[LOCAL FILTER] '{items[i][1]}' rejected before AI (P(relevant)={probability:.3f})")
+                results[i] = {'is_relevant': False, 'relevance_score': round(probability * 100), 'local_filter': True}
+            else:
+                passed.append(i)
+        if len(passed) < len(pending):
+            logger.info(f"Local relevance filter: {len(pending) - len(passed)}/{len(pending)} articles rejected without an AI call")
+        return passed
+
+    async def _relevance_gate(self, items: list, pending: list, results: list, topic_focus: str, default_model: str, on_progress=None) -> list:
+        """
+        Screen pending items with the low-token relevance call; returns the indices that still need
+        full analysis. Rejected items get their screen result in `results` so the relevance check
+        discards them. Gate results are not cached as analyses (thresholds differ per source).
+        """
+        gate_model = self._get_config(self.current_source, 'relevance_gate_model', None) or default_model
+        batch_size = max(1, int(self._get_config(self.current_source, 'relevance_gate_batch_size', 20)))
+        # Borderline scores still get the full analysis, which decides the final score
+        cutoff = self._get_config(self.current_source, 'min_relevance', 50) - self._get_config(self.current_source, 'relevance_gate_margin', 10)
+
+        if on_progress: await on_progress(f"Screening {len(pending)} articles for relevance...")
+        passed = []
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            screens = await self.ai.screen_articles(
+                [{"id": str(i), "title": items[i][1], "text": items[i][2]} for i in chunk],
+                topic_focus,
+                model_name=gate_model
+            )
+            for i in chunk:
+                screen = screens.get(str(i))
+                if screen is not None and screen['relevance_score'] < cutoff:
+                    logger.info(f"[RELEVANCE GATE] '{items[i][1]}' screened out (Score={screen['relevance_score']}, Cutoff={cutoff})")
+                    results[i] = {**screen, 'is_relevant': False}
+                else:
+                    passed.append(i)
+
+        logger.info(f"Relevance gate: {len(passed)}/{len(pending)} articles go to full analysis")
+        return passed
+
     async def _crawl_rss(self, source: Source, on_progress=None):
         import feedparser
         logger.info(f"Crawling RSS: {source.url}")
         
-        # Use httpx to fetch potential redirects/headers
-        async with httpx.AsyncClient(follow_redirects=True) as client:
-            resp = await client.get(source.url, headers={
-                "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-            })
-            resp.raise_for_status()
-            content = resp.content
-            
+        fetch_concurrency = max(1, int(self._get_config(source, 'fetch_concurrency', 5)))
+        timeout = request_timeout(self._get_config(source, 'timeout', 30))
+        
+        # Shared pooled client: the feed and every entry reuse the same connections
+        client = get_http_client()
+        resp = await self._conditional_get(client, source, timeout)
+        if resp is None:
+            return {"status": "not_modified", "articles": 0}
+        content = resp.content
+        
         feed = feedparser.parse(content)
         if on_progress: await on_progress(f"Parsed RSS feed. Found {len(feed.entries)} entries.")
         logger.info(f"Found {len(feed.entries)} RSS entries")
         
-        valid_count = 0
         max_items = self._get_config(source, 'max_articles', 100)
         
-        for entry in feed.entries[:max_items]:
+        # 1. Drop entries we already have before downloading anything (one query per crawl)
+        entries = feed.entries[:max_items]
+        seen_urls = self._existing_values(source, Article.url, [entry.link for entry in entries])
+        
+        pending = []
+        for entry in entries:
             url = entry.link
             
-            # Check DB (Per Source Isolation)
-            existing = self.db.query(Article).filter(
-                Article.url == url,
-                Article.source_id == source.id
-            ).first()
-            
-            if existing: 
+            # Per Source Isolation (also catches the same link repeated within the feed)
+            if url in seen_urls: 
                 logger.info(f"[DECISION] DISCARDED: '{entry.title}' | Reason: Duplicate URL for this source")
                 if on_progress: await on_progress(f"Skipping duplicate: {entry.title}", {"status": "warning"})
                 continue
-            
-            logger.info(f"Processing RSS entry: {url}")
-            
-            summary = ""
-            try:
-                downloaded = trafilatura.fetch_url(url)
-                if downloaded:
-                     result = trafilatura.extract(downloaded, output_format='json', with_metadata=True)
-                     if result:
-                         import json
-                         data = json.loads(result)
-                         if data.get('text'):
-                             summary = data.get('text')[:1000] + "..." if len(data.get('text')) > 1000 else data.get('text')
-            except:
-                pass
-            
-            if not summary and hasattr(entry, 'summary'):
-                summary = entry.summary
-                
+            seen_urls.add(url)
+
             published_at = datetime.now(timezone.utc)
             if hasattr(entry, 'published_parsed') and entry.published_parsed:
                  # published_parsed is a time.struct_time in UTC usually.
                  # datetime(*tuple) creates a naive datetime. We must attach UTC.
                  published_at = datetime(*entry.published_parsed[:6], tzinfo=timezone.utc)
 
+            # Old entries are dropped before their pages are downloaded
+            is_recent, reason = self._is_recent(published_at, source.last_crawled_at)
+            if not is_recent:
+                logger.info(f"Skipping article: {entry.title} | Reason: {reason}")
+                continue
+            
+            pending.append((entry, published_at))
+        
+        # 2. Fetch full text for the remaining entries in parallel (bounded per source). Per-host pacing
+        # (robots Crawl-delay, other sources on the host) may only hold the crawl up for so long;
+        # entries whose slot comes later fall back to the feed summary.
+        if pending:
+            if on_progress: await on_progress(f"Fetching {len(pending)} articles ({fetch_concurrency} at a time)...")
+            logger.info(f"Fetching {len(pending)} RSS entries with concurrency {fetch_concurrency}")
+        semaphore = asyncio.Semaphore(fetch_concurrency)
+        deadline = time.monotonic() + float(self._get_config(source, 'politeness_budget_seconds', 180))
+        texts = await asyncio.gather(*(
+            self._fetch_full_text(client, entry.link, semaphore, timeout, deadline) for entry, _ in pending
+        ))
+        
+        # 3. Validate
+        valid = []
+        for (entry, published_at), summary in zip(pending, texts):
+            url = entry.link
+            logger.info(f"Processing RSS entry: {url}")
+            
+            if not summary and hasattr(entry, 'summary'):
+                summary = text_cleaning.clean_text(entry.summary)
+
             # VALIDATION
             is_valid, reason = self._is_valid_article(entry.title, summary, published_at, source.last_crawled_at)
             if not is_valid:
@@ -236,21 +578,16 @@ class CrawlerService:
                 if on_progress: await on_progress(f"Skipping ({reason}): {entry.title}", {"status": "warning"})
                 continue
             
-            logger.info(f"Valid Article Found: {entry.title}. Sending to AI...")
-            if on_progress: await on_progress(f"Analyzing article: {entry.title}")
+            logger.info(f"Valid Article Found: {entry.title}. Queued for AI...")
+            valid.append((entry, summary, published_at))
+
+        # 4. AI ENRICHMENT (Post-Validation) - Global only as requested, batched and shared across tenants
+        analyses = await self._enrich_many([(entry.link, entry.title, summary) for entry, summary, _ in valid], on_progress=on_progress)
+
+        # 5. Relevance check and save
+        for (entry, summary, published_at), ai_data in zip(valid, analyses):
+            url = entry.link
 
-            # AI ENRICHMENT (Post-Validation) - Global only as requested
-            topic_focus = self.sys_config.content_topic_focus if self.sys_config else "Economics, Trade, Politics, or Finance"
-            analysis_model = self.sys_config.analysis_model if self.sys_config else "gemini-2.0-flash-lite"
-            analysis_prompt = self.sys_config.analysis_prompt if self.sys_config else None
-            
-            ai_data = await self.ai.analyze_article(
-                entry.title, 
-                summary, 
-                topic_focus,
-                model_name=analysis_model,
-                custom_prompt=analysis_prompt
-            )
             # Relevance Check
             is_relevant = ai_data.get('is_relevant', True)
             score = ai_data.get('relevance_score', 0)
@@ -271,8 +608,8 @@ class CrawlerService:
                 # AI Fields
                 language=ai_data.get('language', 'en'),
                 
-                # Content - Prefer cleaned AI text
-                content_snippet=ai_data.get('cleaned_text_original') if ai_data.get('cleaned_text_original') else (summary or entry.summary),
+                # Content - cleaned locally before enrichment
+                content_snippet=summary,
 
                 translated_title=ai_data.get('translated_title'),
                 translated_content_snippet=ai_data.get('translated_text'), 
@@ -291,52 +628,73 @@ class CrawlerService:
                 ai_summary=ai_data.get('ai_summary_en'),
                 ai_summary_original=ai_data.get('ai_summary_original')
             )
-            try:
-                self.db.add(article)
-                self.db.commit()
-                valid_count += 1
-                if on_progress: await on_progress(f"Success! Acquired: {entry.title}", {"status": "success"})
-            except IntegrityError:
-                self.db.rollback()
-                logger.info(f"Article already exists: {url}")
-                if on_progress: await on_progress(f"Skipping (DB Duplicate): {entry.title}", {"status": "warning"})
-                continue
-            except Exception as e:
-                self.db.rollback()
-                logger.error(f"Failed to save article: {e}")
-                if on_progress: await on_progress(f"Error saving: {entry.title} ({str(e)})", {"status": "error"})
-                continue
+            self.article_writer.add(article)
+            if on_progress: await on_progress(f"Success! Acquired: {entry.title}", {"status": "success"})
             
-        return {"status": "success", "articles": valid_count}
+        # Last batch is committed together with the CrawlEvent
+        self.article_writer.flush(commit=False)
+        return {"status": "success", "articles": self.article_writer.inserted}
 
     async def _crawl_html_async(self, source: Source, on_progress=None):
         # 1. Fetch HTML
         try:
-            async with httpx.AsyncClient(timeout=30) as client:
-                response = await client.get(source.url, headers={
-                    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-                })
-                response.raise_for_status()
-                html_content = response.text
-                logger.info(f"Fetched HTML: {len(html_content)} bytes")
-                if on_progress: await on_progress(f"Downloaded HTML ({len(html_content)} bytes). Starting AI extraction...")
+            client = get_http_client()
+            response = await self._conditional_get(client, source, request_timeout(self._get_config(source, 'timeout', 30)))
+            if response is None:
+                return {"status": "not_modified", "articles": 0}
+            html_content = response.text
+            logger.info(f"Fetched HTML: {len(html_content)} bytes")
+            if on_progress: await on_progress(f"Downloaded HTML ({len(html_content)} bytes). Starting AI extraction...")
         except Exception as e:
             logger.error(f"Failed to fetch {source.url}: {e}")
             return {"status": "error", "message": str(e)}
 
-        # 2. Clean HTML for AI (Keep tags but remove bloat)
-        soup = BeautifulSoup(html_content, 'lxml')
-        for tag in soup(['script', 'style', 'svg', 'path', 'iframe', 'footer', 'nav']):
-            tag.decompose()
+        # 2. Deterministic pre-extraction: the model only picks articles from a compact candidate list
+        candidates = []
+        if self._get_config(source, 'link_preextraction', True):
+            candidates = await asyncio.to_thread(extract_link_candidates, html_content, str(response.url))
+            logger.info(f"Link pre-extraction found {len(candidates)} candidates")
         
-        # Convert back to string but limit size to avoid extreme token usage
-        # 50k chars is usually plenty for an index page structure
-        html_snapshot = str(soup)[:50000] 
-        logger.info(f"HTML Snapshot for AI: {len(html_snapshot)} chars")
+        # Learned recipe: reuse the DOM patterns picked by a previous AI extraction and skip the LLM
+        use_recipe = candidates and self._get_config(source, 'learn_extraction_rules', True)
+        recipe = (source.config or {}).get('extraction_recipe') if use_recipe else None
+        if recipe:
+            matches = apply_recipe(candidates, recipe)
+            if recipe_is_valid(matches, recipe):
+                logger.info(f"Extraction recipe matched {len(matches)} links, skipping AI extraction")
+                if on_progress: await on_progress(f"Learned extraction rules matched {len(matches)} articles (AI extraction skipped).")
+                return await self._process_html_items(source, [self._candidate_item(c) for c in matches], on_progress=on_progress)
+            logger.info(f"Extraction recipe matched {len(matches)} links (learned on {recipe.get('article_count')}). Re-learning.")
+            if on_progress: await on_progress("Learned extraction rules no longer match the page. Re-learning with AI...", {"status": "warning"})
         
-        # 3. AI Extraction
         extraction_model = self.sys_config.analysis_model if self.sys_config else "gemini-2.0-flash-lite"
-        extraction_prompt = f"""
+        if candidates:
+            candidate_list = format_candidates_for_prompt(candidates)
+            logger.info(f"Candidate list for AI: {len(candidate_list)} chars")
+            if on_progress: await on_progress(f"Found {len(candidates)} candidate links. Asking AI to pick the news articles...")
+            extraction_prompt = f"""
+The following links were extracted from the news index page {source.url}.
+They are grouped by their position in the page layout; each line is: [id] link text | path | date (if found) | nearby text (if found).
+
+Identify every link that points to an individual news article. Ignore navigation, section or tag pages, author pages, ads, subscriptions and other non-article links.
+Return ONLY a valid JSON array with the ids of the news articles, e.g. [3, 4, 7].
+
+Links:
+---
+{candidate_list}
+"""
+        else:
+            # Fallback (e.g. JS-rendered pages without server-side links): send a cleaned HTML snapshot
+            soup = BeautifulSoup(html_content, 'lxml')
+            for tag in soup(['script', 'style', 'svg', 'path', 'iframe', 'footer', 'nav']):
+                tag.decompose()
+            
+            # Convert back to string but limit size to avoid extreme token usage
+            # 50k chars is usually plenty for an index page structure
+            html_snapshot = str(soup)[:50000] 
+            logger.info(f"HTML Snapshot for AI: {len(html_snapshot)} chars")
+            
+            extraction_prompt = f"""
 Find and extract all news articles from the following HTML source.
 Return a valid JSON array of objects. Each object MUST have:
 - "headline": The title of the news.
@@ -349,10 +707,8 @@ HTML Content:
 {html_snapshot}
 """
         
+        # 3. AI Extraction
         try:
-            # We use analyze_article but with a custom one-shot extraction prompt
-            # For simplicity, we'll use ai.call directly if available, or analyze_article with override
-            # Actually, ai_service has call() for generic tasks.
             json_str = await self.ai.call(extraction_prompt, model_name=extraction_model, response_mime_type="application/json")
             
             if not json_str:
@@ -367,7 +723,13 @@ HTML Content:
                 return {"status": "error", "message": "AI returned invalid JSON"}
 
             if isinstance(items, dict):
-                items = items.get('articles', []) or items.get('items', [])
+                items = items.get('articles', []) or items.get('items', []) or items.get('ids', [])
+            
+            if candidates and isinstance(items, list):
+                selected_ids = self._selected_ids(items)
+                items = [self._candidate_item(c) for c in candidates if c['id'] in selected_ids]
+                if use_recipe:
+                    self._store_recipe(source, learn_recipe(candidates, selected_ids))
             
             if on_progress: await on_progress(f"AI extracted {len(items)} possible news items.")
             
@@ -378,47 +740,35 @@ HTML Content:
             logger.error(f"AI Extraction failed: {e}")
             return {"status": "error", "message": "AI parsing failed"}
 
+        return await self._process_html_items(source, items, on_progress=on_progress)
+
+    async def _process_html_items(self, source: Source, items: list, on_progress=None):
         max_articles = self._get_config(source, 'max_articles', 100)
-        count = 0
         
-        for item in items[:max_articles]:
+        items = [item for item in items[:max_articles] if isinstance(item, dict)]
+        seen_urls = self._existing_values(source, Article.url, [item.get('url') for item in items])
+        
+        found = []
+        for item in items:
             headline = item.get('headline')
             url = item.get('url')
-            snippet = item.get('snippet')
+            snippet = text_cleaning.clean_text(item.get('snippet'))
             
             if not headline or not url: continue
             
             # Deduplicate
-            existing = self.db.query(Article).filter(
-                Article.source_id == source.id,
-                Article.url == url
-            ).first()
-            
-            if existing: 
+            if url in seen_urls: 
                 if on_progress: await on_progress(f"Skipping duplicate: {headline}", {"status": "warning"})
                 continue
+            seen_urls.add(url)
             
             logger.info(f" - [SMART AI] Found Article: {headline}")
-            if on_progress: await on_progress(f"Analyzing article: {headline}")
-            
-            # 4. Full AI Enrichment (Global strategy)
-            topic_focus = self.sys_config.content_topic_focus if self.sys_config else "Economics, Trade, Politics, or Finance"
-            analysis_model = self.sys_config.analysis_model if self.sys_config else "gemini-2.0-flash-lite"
-            analysis_prompt = self.sys_config.analysis_prompt if self.sys_config else None
-            
-            try:
-                ai_data = await self.ai.analyze_article(
-                    headline, 
-                    snippet, 
-                    topic_focus,
-                    model_name=analysis_model,
-                    custom_prompt=analysis_prompt
-                )
-            except Exception as ai_err:
-                logger.error(f"AI Analysis failed for {headline}: {ai_err}")
-                if on_progress: await on_progress(f"AI Failed: {ai_err}", {"status": "error"})
-                ai_data = {}
-            
+            found.append((url, headline, snippet))
+        
+        # 4. Full AI Enrichment (Global strategy, batched and shared across tenants)
+        analyses = await self._enrich_many(found, on_progress=on_progress)
+        
+        for (url, headline, snippet), ai_data in zip(found, analyses):
             # Relevance Check
             min_relevance = self._get_config(source, 'min_relevance', 50)
             if ai_data.get('is_relevant', True) is False or ai_data.get('relevance_score', 0) < min_relevance:
@@ -432,7 +782,7 @@ HTML Content:
                 url=url,
                 raw_title=headline,
                 generated_summary=ai_data.get('ai_summary_en') or snippet,
-                content_snippet=ai_data.get('cleaned_text_original') or snippet,
+                content_snippet=snippet,
                 published_at=datetime.now(timezone.utc), # Date parsing from AI could be improved
                 language=ai_data.get('language', 'en'),
                 translated_title=ai_data.get('translated_title'),
@@ -444,64 +794,74 @@ HTML Content:
                 sentiment=ai_data.get('sentiment'),
                 ai_summary=ai_data.get('ai_summary_en')
             )
-            try:
-                self.db.add(article)
-                self.db.commit()
-                count += 1
-                if on_progress: await on_progress(f"Success! Acquired: {headline}", {"status": "success"})
-            except IntegrityError:
-                self.db.rollback()
-                logger.info(f"Article already exists: {url}")
-                if on_progress: await on_progress(f"Skipping (DB Duplicate): {headline}", {"status": "warning"})
-                continue
-            except Exception as e:
-                self.db.rollback()
-                logger.error(f"Failed to save SMART AI article: {e}")
-                if on_progress: await on_progress(f"Error saving: {headline} ({str(e)})", {"status": "error"})
-                continue
+            self.article_writer.add(article)
+            if on_progress: await on_progress(f"Success! Acquired: {headline}", {"status": "success"})
             
-        return {"status": "success", "articles": count}
+        # Last batch is committed together with the CrawlEvent
+        self.article_writer.flush(commit=False)
+        return {"status": "success", "articles": self.article_writer.inserted}
 
     async def _crawl_dynamic_pdf(self, source: Source, on_progress=None):
-        if on_progress: await on_progress(f"Launching headless browser for: {source.url}")
+        if on_progress: await on_progress(f"Opening headless browser page for: {source.url}")
         logger.info(f"Starting Dynamic PDF Crawl: {source.url}")
         import os
         import tempfile
         
-        # 1. Capture PDF
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            # Use a standard Chrome User Agent
-            context = await browser.new_context(
-                user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-            )
-            page = await context.new_page()
-            
-            # Configure viewport for better visual capture
-            await page.set_viewport_size({"width": 1280, "height": 1080}) 
-            
-            try:
+        # 1. Capture PDF (shared browser, isolated context, unique capture file per crawl)
+        fd, tmp_path = tempfile.mkstemp(prefix="capture_", suffix=".pdf")
+        os.close(fd)
+        fingerprint = []
+        # Request blocking and readiness strategy (per source, see browser_pool for defaults)
+        block_types = self._get_config(source, 'block_resources', DEFAULT_BLOCKED_RESOURCE_TYPES)
+        block_domains = list(DEFAULT_BLOCKED_DOMAINS) if self._get_config(source, 'block_trackers', True) else []
+        block_domains += self._get_config(source, 'block_domains', [])
+        # Pace the navigation like any other fetch to this host (before taking a browser page)
+        await host_limiter.wait(source.url, get_http_client())
+        try:
+            # Use a standard Chrome User Agent; viewport sized for better visual capture
+            async with get_browser_pool().page(
+                user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+                viewport={"width": 1280, "height": 1080},
+                block_resource_types=block_types,
+                block_domains=block_domains
+            ) as page:
                 # Load page with generous timeout for JS
                 timeout_sec = self._get_config(source, 'timeout', 60) * 1000
-                await page.goto(source.url, wait_until="networkidle", timeout=timeout_sec)
+                await wait_until_ready(
+                    page,
+                    source.url,
+                    wait_until=self._get_config(source, 'wait_until', 'domcontentloaded'),
+                    selector=self._get_config(source, 'wait_for_selector', None),
+                    settle_ms=self._get_config(source, 'settle_ms', 3000),
+                    timeout_ms=timeout_sec
+                )
                 
                 # Optional: Scroll to bottom to trigger lazy loading? 
                 # For now, just capture what's visible/rendered.
                 
-                # Create Temp File
-                # DEBUG: Save to local file for inspection
-                tmp_path = "debug_capture.pdf" 
+                # Visual change detection: skip the Vision AI call if no new lines appeared since the last crawl
+                if self._get_config(source, 'visual_change_detection', True):
+                    page_text = await page.evaluate(PAGE_TEXT_SCRIPT, self._get_config(source, 'fingerprint_selector', None))
+                    fingerprint = page_text_fingerprint(page_text)
+                    previous = set((source.crawl_state or {}).get('visual_fingerprint') or [])
+                    new_lines = set(fingerprint) - previous
+                    if fingerprint and previous and not new_lines and not self.force:
+                        logger.info(f"No visual changes since last crawl for {source.url}, skipping Vision AI")
+                        os.remove(tmp_path)
+                        return {"status": "not_modified", "articles": 0}
+                    if previous:
+                        logger.info(f"{len(new_lines)} new text lines since last crawl for {source.url}")
                 
                 await page.pdf(path=tmp_path)
                 logger.info(f"PDF Snapshot captured: {tmp_path}")
                 if on_progress: await on_progress(f"Visual snapshot captured. Sending to Vision AI...")
                 
-            except Exception as e:
-                logger.error(f"Failed to capture PDF for {source.url}: {e}")
-                await browser.close()
-                return {"status": "error", "articles": 0}
-                
-            await browser.close()
+        except Exception as e:
+            logger.error(f"Failed to capture PDF for {source.url}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError: pass
+            return {"status": "error", "articles": 0, "message": f"PDF capture failed: {e}"}
             
         # 2. AI Analysis
         try:
@@ -514,38 +874,46 @@ HTML Content:
             # Inject variables
             full_prompt = raw_prompt.replace('{current_time}', current_time)
                 
-            results = await self.ai.analyze_image_or_pdf(tmp_path, full_prompt, model_name=model)
-            
-            # Cleanup Temp File
             try:
-                os.remove(tmp_path)
-            except: pass
+                results = await self.ai.analyze_image_or_pdf(tmp_path, full_prompt, model_name=model)
+            finally:
+                # Cleanup Temp File
+                try:
+                    os.remove(tmp_path)
+                except OSError: pass
             
-            if not results or not isinstance(results, list):
-                logger.warning(f"AI returned invalid format or empty list for {source.url}")
+            if results is None or not isinstance(results, list):
+                # analyze_image_or_pdf returns None on provider errors; keep the old fingerprint so the next crawl retries
+                logger.warning(f"AI returned invalid format for {source.url}")
                 logger.warning(f"Raw Results: {results}")
+                return {"status": "error", "articles": 0, "message": "Vision AI returned no usable result"}
+            
+            if fingerprint:
+                self.pending_crawl_state['visual_fingerprint'] = fingerprint
+            
+            if not results:
+                logger.warning(f"AI returned an empty list for {source.url}")
                 return {"status": "success", "articles": 0}
                 
             logger.info(f"AI Extracted {len(results)} items from PDF")
             
             max_items = self._get_config(source, 'max_articles', 100)
-            count = 0
-            for item in results[:max_items]:
+            results = [item for item in results[:max_items] if isinstance(item, dict)]
+            # Deduplication: Search by Headline + Source since URL is generic
+            seen_titles = self._existing_values(source, Article.raw_title, [item.get('headline') for item in results])
+            
+            valid = []
+            for item in results:
                 headline = item.get('headline')
-                content = item.get('content')
+                content = text_cleaning.clean_text(item.get('content'))
                 pub_date_str = item.get('published_at')
                 
                 if not headline or not content: continue
                 
-                # Deduplication: Search by Headline + Source since URL is generic
-                existing = self.db.query(Article).filter(
-                    Article.source_id == source.id,
-                    Article.raw_title == headline
-                ).first()
-                
-                if existing:
+                if headline in seen_titles:
                     logger.info(f" - [SKIP] Duplicate: {headline}")
                     continue
+                seen_titles.add(headline)
                     
                 # Parse Date
                 published_at = datetime.now(timezone.utc)
@@ -561,20 +929,16 @@ HTML Content:
                     logger.info(f" - [SKIP] Invalid (Date/Length): {headline}")
                     continue
 
-                # --- Step 5: Full AI Enrichment --- Global only as requested
-                topic_focus = self.sys_config.content_topic_focus if self.sys_config else "Economics, Trade, Politics, or Finance"
-                analysis_model = self.sys_config.analysis_model if self.sys_config else "gemini-2.5-flash-lite"
-                analysis_prompt = self.sys_config.analysis_prompt if self.sys_config else None
+                valid.append((headline, content, published_at))
 
-                if on_progress: await on_progress(f"V-AI Analyzing: {headline}")
-                ai_data = await self.ai.analyze_article(
-                    headline, 
-                    content, 
-                    topic_focus,
-                    model_name=analysis_model,
-                    custom_prompt=analysis_prompt
-                )
-                
+            # --- Step 5: Full AI Enrichment --- Global only as requested, batched and shared across tenants
+            analyses = await self._enrich_many(
+                [(f"{source.url}#{headline}", headline, content) for headline, content, _ in valid],
+                default_model="gemini-2.5-flash-lite",
+                on_progress=on_progress
+            )
+
+            for (headline, content, published_at), ai_data in zip(valid, analyses):
                 # Check Relevance (Score from full analysis)
                 min_relevance = self._get_config(source, 'min_relevance', 50)
                 is_relevant = ai_data.get('is_relevant', True)
@@ -597,7 +961,7 @@ HTML Content:
                     url=synthetic_url, 
                     raw_title=headline,
                     generated_summary=ai_data.get('ai_summary_en') or content[:1000],
-                    content_snippet=ai_data.get('cleaned_text_original') or content,
+                    content_snippet=content,
                     
                     # Language & Translation
                     language=ai_data.get('language', 'en'),
@@ -617,28 +981,17 @@ HTML Content:
                     ai_summary_original=ai_data.get('ai_summary_original')
                 )
                 
-                try:
-                    self.db.add(article)
-                    self.db.commit()
-                    count += 1
-                    if on_progress: await on_progress(f"Success! Acquired: {headline}", {"status": "success"})
-                except IntegrityError:
-                    self.db.rollback()
-                    logger.info(f"PDF Article already exists: {synthetic_url}")
-                    if on_progress: await on_progress(f"Skipping (DB Duplicate): {headline}", {"status": "warning"})
-                    continue
-                except Exception as e:
-                    self.db.rollback()
-                    logger.error(f"Failed to save PDF article: {e}")
-                    if on_progress: await on_progress(f"Error saving: {headline} ({str(e)})", {"status": "error"})
-                    continue
+                self.article_writer.add(article)
+                if on_progress: await on_progress(f"Success! Acquired: {headline}", {"status": "success"})
                 
-            logger.info(f"Finished PDF scan. Acquired {count} new items.")
-            return {"status": "success", "articles": count}
+            # Last batch is committed together with the CrawlEvent
+            self.article_writer.flush(commit=False)
+            logger.info(f"Finished PDF scan. Acquired {self.article_writer.inserted} new items.")
+            return {"status": "success", "articles": self.article_writer.inserted}
             
         except Exception as e:
             logger.error(f"Error processing PDF crawl results: {e}")
-            return {"status": "error", "articles": 0}
+            return {"status": "error", "articles": 0, "message": f"PDF crawl failed: {e}"}
 
 def run_crawler(source_id: str):
     # Wrapper to run async code synchronously
@@ -0,0 +1,158 @@
+"""
+Enrichment profiles: what the article analysis asks the LLM for.
+
+- minimal:  language, relevance, translated headline, tags, sentiment
+- standard: minimal + entities and one-sentence summaries (both languages)
+- full:     standard + the translated article text (the previous default output)
+
+Each field has a compact response key and a length cap. Prompts ask for the
+compact keys, Gemini gets a response schema and Claude a forced tool call with
+the matching JSON schema, and expand() maps responses back to the field names
+the crawler stores, enforcing the caps. Articles already in English
+(english_only) don't ask for translations; expand() copies the English values.
+"""
+from collections import namedtuple
+
+DEFAULT_PROFILE = "full"
+
+Field = namedtuple("Field", "key kind cap description translation")
+
+TAG_FORMAT = 'ALL CAPS, no diacritics, underscores for spaces (e.g. "WORLD_BANK")'
+
+FIELDS = {
+    "language": Field("l", "str", 8, 'language of the article as an ISO 639-1 code (e.g. "pt")', True),
+    "is_relevant": Field("r", "bool", None, 'true if the article is relevant to "{topic_focus}", else false', False),
+    "relevance_score": Field("s", "score", None, 'relevance to "{topic_focus}", integer 0-100', False),
+    "translated_title": Field("tt", "str", 200, "the headline translated to English", True),
+    "translated_text": Field("tx", "str", 4000, "the text translated to English", True),
+    "tags_en": Field("te", "list", (5, 40), f"up to 5 key tags in English, {TAG_FORMAT}", False),
+    "tags_original": Field("to", "list", (5, 40), f"the same tags in the article's language, {TAG_FORMAT}", True),
+    "entities_en": Field("ee", "list", (8, 60), f"up to 8 key named entities in English, {TAG_FORMAT}", False),
+    "entities_original": Field("eo", "list", (8, 60), f"the same entities in the article's language, {TAG_FORMAT}", True),
+    "sentiment": Field("se", "sentiment", None, '"positive", "neutral" or "negative"', False),
+    "ai_summary_en": Field("su", "str", 300, "one-sentence executive summary in English", False),
+    "ai_summary_original": Field("so", "str", 300, "the same summary in the article's language", True),
+}
+
+_MINIMAL = ["language", "is_relevant", "relevance_score", "translated_title", "tags_en", "sentiment"]
+_STANDARD = _MINIMAL + ["tags_original", "entities_en", "entities_original", "ai_summary_en", "ai_summary_original"]
+PROFILES = {
+    "minimal": _MINIMAL,
+    "standard": _STANDARD,
+    "full": _STANDARD + ["translated_text"],
+}
+
+SENTIMENTS = ("positive", "neutral", "negative")
+
+
+def profile_fields(profile: str, english_only: bool = False) -> list:
+    fields = PROFILES.get(profile or DEFAULT_PROFILE, PROFILES[DEFAULT_PROFILE])
+    if english_only:
+        fields = [name for name in fields if not FIELDS[name].translation]
+    return fields
+
+
+def build_prompt(profile: str = DEFAULT_PROFILE, english_only: bool = False) -> str:
+    """Analysis prompt with {title}, {text} and {topic_focus} placeholders."""
+    keys = "\n".join(
+        f'        - "{FIELDS[name].key}": {FIELDS[name].description}' + (
+            f" (max {FIELDS[name].cap} characters)" if FIELDS[name].kind == "str" else ""
+        )
+        for name in profile_fields(profile, english_only)
+    )
+    article = "English news article" if english_only else "news article"
+    return f"""
+        You are an expert news analyst. Analyze the following {article}.
+
+        Headline: {{title}}
+        Text: {{text}}
+
+        Return ONLY raw valid JSON (no markdown formatting) with exactly these keys:
+{keys}
+        """
+
+
+def _property(field: Field, json_schema: bool) -> dict:
+    t = (lambda name: name.lower()) if json_schema else (lambda name: name)
+    if field.kind == "str":
+        return {"type": t("STRING"), "maxLength": field.cap}
+    if field.kind == "bool":
+        return {"type": t("BOOLEAN")}
+    if field.kind == "score":
+        return {"type": t("INTEGER"), "minimum": 0, "maximum": 100}
+    if field.kind == "sentiment":
+        return {"type": t("STRING"), "enum": list(SENTIMENTS)}
+    items, length = field.cap
+    return {"type": t("ARRAY"), "items": {"type": t("STRING"), "maxLength": length}, "maxItems": items}
+
+
+def _object_schema(profile: str, english_only: bool, batch: bool, json_schema: bool) -> dict:
+    t = (lambda name: name.lower()) if json_schema else (lambda name: name)
+    fields = profile_fields(profile, english_only)
+    properties = {FIELDS[name].key: _property(FIELDS[name], json_schema) for name in fields}
+    required = [FIELDS[name].key for name in fields]
+    if batch:
+        properties = {"id": {"type": t("STRING")}, **properties}
+        required = ["id"] + required
+    return {"type": t("OBJECT"), "properties": properties, "required": required}
+
+
+def gemini_schema(profile: str = DEFAULT_PROFILE, english_only: bool = False, batch: bool = False) -> dict:
+    """Gemini response_schema: one object, or an array of objects with "id" for batches."""
+    item = _object_schema(profile, english_only, batch, json_schema=False)
+    return {"type": "ARRAY", "items": item} if batch else item
+
+
+def json_schema(profile: str = DEFAULT_PROFILE, english_only: bool = False, batch: bool = False) -> dict:
+    """JSON schema for a Claude tool input (tool inputs must be objects, so batches nest under "articles")."""
+    item = _object_schema(profile, english_only, batch, json_schema=True)
+    if not batch:
+        return item
+    return {"type": "object", "properties": {"articles": {"type": "array", "items": item}}, "required": ["articles"]}
+
+
+def _coerce(value, field: Field):
+    if field.kind == "str":
+        return str(value).strip()[:field.cap] if value is not None else None
+    if field.kind == "bool":
+        return value if isinstance(value, bool) else str(value).strip().lower() in ("true", "yes", "1")
+    if field.kind == "score":
+        try:
+            return max(0, min(100, int(float(value))))
+        except (TypeError, ValueError):
+            return None
+    if field.kind == "sentiment":
+        value = str(value).strip().lower()
+        return value if value in SENTIMENTS else None
+    items, length = field.cap
+    if not isinstance(value, list):
+        return None
+    return [str(v).strip()[:length] for v in value if v not in (None, "")][:items]
+
+
+def expand(raw: dict, title: str = "", text: str = "", english_only: bool = False) -> dict:
+    """
+    Map a response (compact or full keys) to full field names with caps enforced. Keys a custom
+    prompt defined beyond ours are kept as they are.
+    """
+    if not isinstance(raw, dict) or not raw:
+        return {}
+    compact = {field.key for field in FIELDS.values()}
+    result = {k: v for k, v in raw.items() if k not in compact and k not in FIELDS}
+    for name, field in FIELDS.items():
+        value = raw.get(field.key, raw.get(name))
+        if value is not None:
+            coerced = _coerce(value, field)
+            if coerced is not None:
+                result[name] = coerced
+
+    if english_only:
+        result.update({
+            "language": "en",
+            "translated_title": title,
+            "translated_text": text,
+            "tags_original": result.get("tags_en"),
+            "entities_original": result.get("entities_en"),
+            "ai_summary_original": result.get("ai_summary_en"),
+        })
+    return result
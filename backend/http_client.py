@@ -0,0 +1,152 @@
+"""
+Process-wide HTTP client used by every crawl path.
+
+httpx clients are bound to the event loop they were first used on, so we keep
+one pooled AsyncClient per running loop. All of them share a small DNS cache so
+sources hosted on the same CDN only resolve once per TTL.
+"""
+import asyncio
+import os
+import socket
+import threading
+import time
+import weakref
+from typing import Optional
+
+import httpx
+import httpcore
+
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+# Pool limits (overridable per deployment)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "40"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+DNS_CACHE_TTL = float(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+DEFAULT_TIMEOUT_SECONDS = 30
+
+try:
+    import h2  # noqa: F401 - only needed for HTTP/2 support
+    HTTP2_ENABLED = True
+except ImportError:
+    HTTP2_ENABLED = False
+
+_dns_cache: dict = {}  # (host, port) -> (expires_at, [ip, ...])
+_dns_lock = threading.Lock()
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+
+
+class _CachingNetworkBackend(httpcore.AsyncNetworkBackend):
+    """Resolves hostnames through a shared TTL cache before opening TCP connections."""
+
+    def __init__(self):
+        self._inner = httpcore.AnyIOBackend()
+
+    async def _resolve(self, host: str, port: int) -> list:
+        key = (host, port)
+        now = time.monotonic()
+        with _dns_lock:
+            cached = _dns_cache.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        loop = asyncio.get_running_loop()
+        infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        addresses = []
+        for info in infos:
+            ip = info[4][0]
+            if ip not in addresses:
+                addresses.append(ip)
+
+        with _dns_lock:
+            _dns_cache[key] = (now + DNS_CACHE_TTL, addresses)
+        return addresses
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        try:
+            addresses = await self._resolve(host, port)
+        except OSError as e:
+            logger.debug(f"DNS cache lookup failed for {host}: {e}")
+            addresses = [host]
+
+        last_error = None
+        for address in addresses:
+            try:
+                return await self._inner.connect_tcp(
+                    address, port, timeout=timeout, local_address=local_address, socket_options=socket_options
+                )
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                last_error = e
+
+        # Every cached address failed; drop the entry so the next attempt re-resolves
+        with _dns_lock:
+            _dns_cache.pop((host, port), None)
+        raise last_error
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self._inner.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds: float) -> None:
+        await self._inner.sleep(seconds)
+
+
+def _build_transport() -> httpx.AsyncHTTPTransport:
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+    transport = httpx.AsyncHTTPTransport(http2=HTTP2_ENABLED, limits=limits, retries=1)
+    try:
+        # httpx does not expose the network backend, so swap the pool for one that uses the DNS cache
+        transport._pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(),
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            http1=True,
+            http2=HTTP2_ENABLED,
+            retries=1,
+            network_backend=_CachingNetworkBackend(),
+        )
+    except Exception as e:
+        logger.warning(f"DNS caching unavailable, using default transport: {e}")
+    return transport
+
+
+def request_timeout(seconds: Optional[float] = None) -> httpx.Timeout:
+    """Per-request timeout derived from page_load_timeout_seconds (connect capped at 10s)."""
+    seconds = float(seconds or DEFAULT_TIMEOUT_SECONDS)
+    return httpx.Timeout(seconds, connect=min(seconds, 10.0))
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared AsyncClient for the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        client = _clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                transport=_build_transport(),
+                follow_redirects=True,
+                timeout=request_timeout(),
+                headers={"User-Agent": DEFAULT_USER_AGENT},
+            )
+            _clients[loop] = client
+            logger.info(f"Created shared HTTP client (http2={HTTP2_ENABLED}, max_connections={HTTP_MAX_CONNECTIONS})")
+    return client
+
+
+async def close_http_client():
+    """Close the shared client of the running event loop (e.g. on shutdown)."""
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        client = _clients.pop(loop, None)
+    if client is not None and not client.is_closed:
+        await client.aclose()
@@ -0,0 +1,116 @@
+"""
+In-process language identification, no network or model files.
+
+Non-Latin scripts are identified by Unicode block. Latin-script text is scored
+against character-trigram profiles built at import time from each language's
+most frequent words (function words dominate news text, so their trigrams
+separate the languages well). Used by the crawler to skip LLM translation for
+articles already in the target language.
+"""
+import math
+import re
+import unicodedata
+from collections import Counter
+
+MIN_LETTERS = 40  # Below this the guess is not worth acting on
+SMOOTHING = 0.5
+
+_COMMON_WORDS = {
+    "en": "the of and to in a is that for it as was with be by on not he i this are or his from at which but have an they "
+          "you were her she there been one all we their has would will more if no when can said who after about new year "
+          "government minister president people also over than its into could two first last million percent market",
+    "es": "de la que el en y a los se del las un por con no una su para es al lo como más pero sus le ya o fue este ha "
+          "sí porque esta son entre cuando muy sin sobre también me hasta hay donde quien desde todo nos durante todos "
+          "gobierno presidente ministro año millones según país mercado economía dijo",
+    "pt": "de a o que e do da em um para é com não uma os no se na por mais as dos como mas foi ao ele das tem à seu sua "
+          "ou ser quando muito há nos já está também só pelo pela até isso ela entre depois sem mesmo aos ter seus "
+          "governo presidente ministro ano milhões segundo país mercado economia disse",
+    "fr": "de la le et les des en un du une que est pour qui dans a par plus pas au sur ne se ce il sont avec ou mais "
+          "comme été aux elle son sa ses leur cette nous vous ont était entre aussi après sans dont même "
+          "gouvernement président ministre année millions selon pays marché économie déclaré",
+    "de": "der die und in den von zu das mit sich des auf für ist im dem nicht ein eine als auch es an werden aus er hat "
+          "dass sie nach wird bei einer um am sind noch wie einem über einen so zum war haben nur oder aber vor zur "
+          "regierung präsident minister jahr millionen prozent land markt wirtschaft sagte",
+    "it": "di e il la che in a per un è del non una le si con i da al dei sono della più lo come ma ha anche nel gli "
+          "alla delle ci questo ed se suo sua tra dopo stato essere quando molto già senza cui degli "
+          "governo presidente ministro anno milioni secondo paese mercato economia detto",
+    "nl": "de van het een en in is dat op te zijn voor met die niet aan er om ook als dan maar bij of uit nog wel naar "
+          "kan was door worden heeft over hij tot ze wordt deze na zich meer werd jaar omdat "
+          "regering president minister miljoen procent land markt economie zei",
+}
+
+_SCRIPTS = [
+    ("ja", re.compile(r'[぀-ヿ]')),
+    ("ko", re.compile(r'[가-힯]')),
+    ("zh", re.compile(r'[一-鿿]')),
+    ("ar", re.compile(r'[؀-ۿ]')),
+    ("he", re.compile(r'[֐-׿]')),
+    ("el", re.compile(r'[Ͱ-Ͽ]')),
+    ("ru", re.compile(r'[Ѐ-ӿ]')),
+    ("hi", re.compile(r'[ऀ-ॿ]')),
+    ("th", re.compile(r'[฀-๿]')),
+]
+
+
+def _trigrams(text: str) -> Counter:
+    counts = Counter()
+    for word in re.findall(r'[^\W\d_]+', text.lower()):
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            counts[padded[i:i + 3]] += 1
+    return counts
+
+
+def _build_profiles() -> dict:
+    profiles = {}
+    for lang, words in _COMMON_WORDS.items():
+        # Earlier (more frequent) words weigh more
+        ranked = words.split()
+        counts = Counter()
+        for rank, word in enumerate(ranked):
+            weight = 1 + (len(ranked) - rank) / len(ranked)
+            for gram, n in _trigrams(word).items():
+                counts[gram] += n * weight
+        profiles[lang] = (counts, sum(counts.values()))
+    return profiles
+
+
+_PROFILES = _build_profiles()
+_VOCABULARY = len({gram for counts, _ in _PROFILES.values() for gram in counts})
+
+
+def detect(text: str) -> tuple:
+    """(ISO 639-1 code, confidence 0-1), or (None, 0.0) when the text is too short to tell."""
+    sample = (text or '')[:5000]
+    letters = [c for c in sample if c.isalpha()]
+    if len(letters) < MIN_LETTERS:
+        return None, 0.0
+
+    # Non-Latin scripts: the dominant Unicode block decides
+    for lang, pattern in _SCRIPTS:
+        share = len(pattern.findall(sample)) / len(letters)
+        # Japanese mixes kana into mostly-Han text
+        if share > 0.3 or (lang == "ja" and share > 0.05):
+            return lang, min(1.0, share + 0.2)
+    latin = sum(1 for c in letters if 'LATIN' in unicodedata.name(c, ''))
+    if latin / len(letters) < 0.7:
+        return None, 0.0
+
+    grams = _trigrams(sample)
+    total = sum(grams.values())
+    scores = {}
+    for lang, (counts, size) in _PROFILES.items():
+        denominator = size + SMOOTHING * _VOCABULARY
+        # Mean log-likelihood per trigram, so long texts don't get absurdly confident
+        scores[lang] = sum(n * math.log((counts.get(g, 0) + SMOOTHING) / denominator) for g, n in grams.items()) / total
+
+    best = max(scores, key=scores.get)
+    # Softmax over per-trigram scores, sharpened by the amount of evidence (capped)
+    sharpness = min(total, 200) / 4
+    exp_scores = {lang: math.exp((score - scores[best]) * sharpness) for lang, score in scores.items()}
+    return best, exp_scores[best] / sum(exp_scores.values())
+
+
+def is_language(text: str, lang: str, min_confidence: float = 0.9) -> bool:
+    detected, confidence = detect(text)
+    return detected == lang and confidence >= min_confidence
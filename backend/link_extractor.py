@@ -0,0 +1,225 @@
+"""
+Deterministic link pre-extraction for the Smart HTML crawler.
+
+Collects anchor candidates from an index page (title, absolute URL, nearby date
+and snippet) and groups them by DOM pattern, so the LLM only has to pick the
+article links from a compact list instead of reading raw HTML.
+"""
+import re
+from collections import OrderedDict
+from urllib.parse import urljoin, urlparse, urldefrag
+
+import lxml.html
+
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+MAX_CANDIDATES = 300
+MIN_TITLE_CHARS = 15
+MIN_TITLE_WORDS = 3
+SNIPPET_CHARS = 200
+PATTERN_DEPTH = 3  # Ancestors (plus the anchor) used for the DOM pattern signature
+
+STRIP_TAGS = ['script', 'style', 'noscript', 'svg', 'iframe', 'form', 'button', 'select']
+SKIP_SCHEMES = ('javascript:', 'mailto:', 'tel:', 'whatsapp:', 'data:')
+
+_MONTHS = r'(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec|ene|abr|ago|dic|fev|mai|set|out|dez)[a-z]*\.?'
+DATE_PATTERNS = [
+    re.compile(r'\b\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2})?(?:Z|[+-]\d{2}:?\d{2})?)?\b'),
+    re.compile(r'\b\d{1,2}[/.]\d{1,2}[/.]\d{2,4}\b'),
+    re.compile(r'\b\d{1,2}(?:\s+de)?\s+' + _MONTHS + r'(?:\s+de)?,?\s+\d{4}\b', re.IGNORECASE),
+    re.compile(r'\b' + _MONTHS + r'\s+\d{1,2},?\s+\d{4}\b', re.IGNORECASE),
+    re.compile(r'\b(?:hace\s+)?\d+\s*(?:min(?:ute)?s?|h(?:ours?|oras?)?|hrs?|d(?:ays?|ías?)?)(?:\s+ago)?\b', re.IGNORECASE),
+]
+
+
+def _clean_text(text: str) -> str:
+    return re.sub(r'\s+', ' ', text or '').strip()
+
+
+def _element_text(el) -> str:
+    # itertext keeps adjacent blocks apart ("2 may La decisión" instead of "2 mayLa decisión")
+    return _clean_text(' '.join(el.itertext()))
+
+
+def _node_signature(el) -> str:
+    """tag.firstclass for one element; digits are dropped so generated class names still group."""
+    classes = (el.get('class') or '').split()
+    if classes:
+        cls = re.sub(r'\d+', '', classes[0]).strip('-_')
+        if cls:
+            return f"{el.tag}.{cls}"
+    return el.tag
+
+
+def dom_pattern(anchor) -> str:
+    """CSS-like path of the anchor and its nearest ancestors, e.g. 'article.card > h3 > a'."""
+    parts = [_node_signature(anchor)]
+    parent = anchor.getparent()
+    while parent is not None and len(parts) <= PATTERN_DEPTH and isinstance(parent.tag, str):
+        if parent.tag in ('body', 'html'):
+            break
+        parts.append(_node_signature(parent))
+        parent = parent.getparent()
+    return ' > '.join(reversed(parts))
+
+
+def _same_site(url: str, base_host: str) -> bool:
+    host = urlparse(url).netloc.lower()
+    host = host[4:] if host.startswith('www.') else host
+    return host == base_host or host.endswith('.' + base_host) or base_host.endswith('.' + host)
+
+
+def _anchor_title(anchor) -> str:
+    title = _element_text(anchor)
+    if len(title) < MIN_TITLE_CHARS:
+        title = _clean_text(anchor.get('title') or anchor.get('aria-label') or title)
+    return title
+
+
+def _find_container(anchor):
+    """Widest ancestor (up to 4 levels) that links to at most one other URL, e.g. a section tag."""
+    own_href = urldefrag(anchor.get('href', ''))[0]
+    container = anchor
+    parent = anchor.getparent()
+    for _ in range(4):
+        if parent is None or not isinstance(parent.tag, str) or parent.tag in ('body', 'html'):
+            break
+        other_hrefs = {urldefrag(a.get('href', ''))[0] for a in parent.iter('a') if a.get('href')} - {own_href}
+        if len(other_hrefs) > 1:
+            break
+        container = parent
+        parent = parent.getparent()
+    return container
+
+
+def _find_date(container):
+    for time_el in container.iter('time'):
+        value = time_el.get('datetime') or _element_text(time_el)
+        if value:
+            return value
+    text = _element_text(container)
+    for pattern in DATE_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return match.group(0)
+    return None
+
+
+def extract_link_candidates(html: str, base_url: str) -> list:
+    """
+    Return article-link candidates as dicts:
+    {"id", "headline", "url", "date", "snippet", "pattern"}.
+    """
+    try:
+        doc = lxml.html.fromstring(html)
+    except Exception as e:
+        logger.warning(f"Link pre-extraction could not parse HTML for {base_url}: {e}")
+        return []
+
+    for el in doc.xpath('//' + ' | //'.join(STRIP_TAGS)):
+        el.drop_tree()
+
+    base_host = urlparse(base_url).netloc.lower()
+    base_host = base_host[4:] if base_host.startswith('www.') else base_host
+    base_clean = urldefrag(base_url)[0].rstrip('/')
+
+    by_url = OrderedDict()
+    for anchor in doc.iter('a'):
+        href = (anchor.get('href') or '').strip()
+        if not href or href.startswith('#') or href.lower().startswith(SKIP_SCHEMES):
+            continue
+
+        url = urldefrag(urljoin(base_url, href))[0]
+        if not url.startswith(('http://', 'https://')) or url.rstrip('/') == base_clean:
+            continue
+        if not _same_site(url, base_host):
+            continue
+
+        title = _anchor_title(anchor)
+        if len(title) < MIN_TITLE_CHARS or len(title.split()) < MIN_TITLE_WORDS:
+            continue
+
+        container = _find_container(anchor)
+        snippet = _element_text(container).replace(title, '', 1).strip(' -|·')
+        candidate = {
+            "headline": title,
+            "url": url,
+            "date": _find_date(container),
+            "snippet": snippet[:SNIPPET_CHARS] or None,
+            "pattern": dom_pattern(anchor),
+        }
+
+        # Same URL linked twice (image + headline): keep the more descriptive one
+        previous = by_url.get(url)
+        if previous is None or len(title) > len(previous["headline"]):
+            by_url[url] = candidate
+
+    candidates = list(by_url.values())[:MAX_CANDIDATES]
+    for i, candidate in enumerate(candidates, start=1):
+        candidate["id"] = i
+    return candidates
+
+
+def group_by_pattern(candidates: list) -> list:
+    """Group candidates by DOM pattern, largest groups first: [(pattern, [candidate, ...]), ...]."""
+    groups = OrderedDict()
+    for candidate in candidates:
+        groups.setdefault(candidate["pattern"], []).append(candidate)
+    return sorted(groups.items(), key=lambda item: len(item[1]), reverse=True)
+
+
+def format_candidates_for_prompt(candidates: list) -> str:
+    """Compact text listing: one line per candidate, grouped under its DOM pattern."""
+    lines = []
+    for n, (pattern, members) in enumerate(group_by_pattern(candidates), start=1):
+        lines.append(f"## Group {n} ({len(members)} links) [{pattern}]")
+        for c in members:
+            path = urlparse(c["url"]).path or "/"
+            parts = [f"[{c['id']}] {c['headline'][:160]}", path]
+            if c.get("date"):
+                parts.append(c["date"])
+            if c.get("snippet"):
+                parts.append(c["snippet"][:120])
+            lines.append(" | ".join(parts))
+    return "\n".join(lines)
+
+
+def learn_recipe(candidates: list, selected_ids: list, min_precision: float = 0.6, min_coverage: float = 0.8):
+    """
+    Derive a reusable extraction recipe from one AI selection.
+
+    Keeps the DOM patterns whose links the model mostly accepted. Titles, dates and
+    snippets come from the same deterministic rules as extract_link_candidates, so the
+    recipe only needs the link patterns. Returns None if the selection isn't explained
+    by a few clean patterns (then the AI stays in the loop).
+    """
+    selected = set(selected_ids)
+    if not selected:
+        return None
+
+    patterns = []
+    covered = 0
+    for pattern, members in group_by_pattern(candidates):
+        hits = sum(1 for c in members if c["id"] in selected)
+        if hits and hits / len(members) >= min_precision:
+            patterns.append(pattern)
+            covered += hits
+
+    if not patterns or covered / len(selected) < min_coverage:
+        return None
+
+    return {"link_patterns": patterns, "article_count": len(selected)}
+
+
+def apply_recipe(candidates: list, recipe: dict) -> list:
+    """Candidates matching the recipe's link patterns, in page order."""
+    patterns = set(recipe.get("link_patterns") or [])
+    return [c for c in candidates if c["pattern"] in patterns]
+
+
+def recipe_is_valid(matches: list, recipe: dict) -> bool:
+    """A recipe that suddenly finds far fewer links than when it was learned means the layout changed."""
+    expected = recipe.get("article_count") or 1
+    return len(matches) >= max(1, expected // 4)
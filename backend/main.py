@@ -28,6 +28,8 @@ from schemas import (
 )
 from auth import get_current_user
 from crawler import run_crawler, CrawlerService
+from crawl_scheduler import next_crawl_at, current_interval
+import response_cache
 from clustering import analyze_clusters
 from report_generator import ReportGenerator
 from pdf_service import generate_pdf
@@ -72,11 +74,29 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Migration (notion) failed: {e}")
 
+    try:
+        from update_schema_crawl_state import migrate as migrate_crawl_state
+        logger.info("Running schema migration (crawl state)...")
+        migrate_crawl_state()
+    except Exception as e:
+        logger.error(f"Migration (crawl state) failed: {e}")
+
+    try:
+        from update_schema_enrichment_profile import migrate as migrate_enrichment_profile
+        logger.info("Running schema migration (enrichment profile)...")
+        migrate_enrichment_profile()
+    except Exception as e:
+        logger.error(f"Migration (enrichment profile) failed: {e}")
+
     Base.metadata.create_all(bind=engine)
     # scheduler_service.start() # No longer used, moved to Celery
     yield
     # Shutdown
     # scheduler_service.stop()
+    from http_client import close_http_client
+    await close_http_client()
+    from browser_pool import close_browser_pool
+    await close_browser_pool()
 
 app = FastAPI(title="News Aggregator API", version="0.1.0", lifespan=lifespan)
 app.include_router(pipeline_endpoints.router)
@@ -120,6 +140,7 @@ def health_scheduler(db: Session = Depends(get_db)):
             "redis_broker": mask_url(REDIS_URL),
             "redis_status": redis_status
         },
+        "ai_response_cache": response_cache.stats(),
         "total_sources": len(sources),
         "sources": []
     }
@@ -129,18 +150,16 @@ def health_scheduler(db: Session = Depends(get_db)):
         if last and last.tzinfo is None:
             last = last.replace(tzinfo=timezone.utc)
         
-        due = False
-        if not last:
-            due = True
-        else:
-            next_crawl = last + timedelta(minutes=s.crawl_interval or 15)
-            due = next_crawl <= now
+        next_crawl = next_crawl_at(s)
+        due = next_crawl is None or next_crawl <= now
             
         report["sources"].append({
             "id": s.id,
             "name": s.name or s.url,
             "status": s.status,
             "last_crawled_at": last,
+            "crawl_interval_mins": current_interval(s),
+            "next_crawl_at": next_crawl,
             "is_due": due
         })
         
@@ -382,7 +401,7 @@ async def crawl_source_stream(source_id: str, db: Session = Depends(get_db), cur
         try:
             crawler = CrawlerService(inner_db)
             # Start crawl in background
-            crawl_task = asyncio.create_task(crawler.crawl_source_async(source_id, on_progress=on_progress))
+            crawl_task = asyncio.create_task(crawler.crawl_source_async(source_id, on_progress=on_progress, force=True))
             
             while True:
                 # If task is done, we might still have items in the queue
@@ -785,10 +804,17 @@ def update_source(source_id: str, source_update: SourceUpdate, db: Session = Dep
         db_source.status = source_update.status
         flag_modified(db_source, 'status')
     if source_update.crawl_interval is not None:
+        if source_update.crawl_interval != db_source.crawl_interval and db_source.crawl_state:
+            # A new base interval restarts adaptation from it
+            db_source.crawl_state = {k: v for k, v in db_source.crawl_state.items() if k != 'adaptive_interval_mins'}
         db_source.crawl_interval = source_update.crawl_interval
         flag_modified(db_source, 'crawl_interval')
     if source_update.crawl_config is not None:
-        db_source.config = source_update.crawl_config
+        new_config = dict(source_update.crawl_config)
+        # The extraction recipe is learned by the crawler; keep it unless the client sends one
+        if 'extraction_recipe' not in new_config and db_source.config and 'extraction_recipe' in db_source.config:
+            new_config['extraction_recipe'] = db_source.config['extraction_recipe']
+        db_source.config = new_config
         flag_modified(db_source, 'config')  # JSON column — must be explicitly flagged
     if source_update.crawl_method is not None:
         db_source.crawl_method = source_update.crawl_method
@@ -902,13 +928,13 @@ async def update_settings(settings: schemas.SettingsUpdate, db: Session = Depend
         raise HTTPException(status_code=500, detail=str(e))
 
 def _ai_service_for_user(user) -> "AIService":
-    """Construct AIService respecting each key's enabled flag."""
-    from ai_service import AIService
+    """Shared AIService respecting each key's enabled flag."""
+    from ai_service import get_ai_service
     google_key = user.google_api_key if getattr(user, 'google_api_key_enabled', True) else None
     anthropic_key = getattr(user, 'anthropic_api_key', None)
     if not getattr(user, 'anthropic_api_key_enabled', True):
         anthropic_key = None
-    return AIService(api_key=google_key, anthropic_api_key=anthropic_key)
+    return get_ai_service(api_key=google_key, anthropic_api_key=anthropic_key)
 
 @app.get("/api/ai/models")
 def list_ai_models(current_user: User = Depends(get_current_user)):
@@ -1183,7 +1209,7 @@ def generate_report(
     current_user: User = Depends(get_current_user)
 ):
     import time
-    from ai_service import AIService as _AIService
+    from ai_service import get_ai_service as _get_ai_service
 
     start_time = time.time()
 
@@ -1280,7 +1306,7 @@ def generate_report(
             f.write(f"Using model: {selected_model}\n")
     except: pass
         
-    ai_report_service = _AIService(api_key=google_key, anthropic_api_key=anthropic_key)
+    ai_report_service = _get_ai_service(api_key=google_key, anthropic_api_key=anthropic_key)
 
     # Prepare Context Variables for Interpolation
     prompt_variables = {
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, JSON, UniqueConstraint, types
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, JSON, Float, UniqueConstraint, types
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import uuid
@@ -82,6 +82,7 @@ class Source(Base):
     status = Column(String, default="active") # active, error
     config = Column(JSON, default={}) # Stores: max_articles, min_relevance, min_length
     reference_name = Column(String, nullable=True) # Shorter name for citations
+    crawl_state = Column(JSON, default={}) # Crawler-managed: HTTP validators (etag, last_modified, content_hash), visual_fingerprint
     
     user = relationship("User", back_populates="sources")
     articles = relationship("Article", back_populates="source", cascade="all, delete-orphan")
@@ -139,7 +140,7 @@ class CrawlEvent(Base):
     id = Column(String, primary_key=True, index=True, default=generate_uuid)
     source_id = Column(String, ForeignKey("sources.id"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    status = Column(String) # 'success', 'error'
+    status = Column(String) # 'success', 'not_modified', 'error'
     articles_count = Column(Integer, default=0)
     
     source = relationship("Source", back_populates="crawl_logs")
@@ -239,6 +240,7 @@ class SystemConfig(Base):
     
     analysis_model = Column(String, nullable=True)
     analysis_prompt = Column(Text, nullable=True)
+    enrichment_profile = Column(String, default="full") # minimal | standard | full (see enrichment_profiles.py)
     
     clustering_model = Column(String, nullable=True)
     clustering_prompt = Column(Text, nullable=True)
@@ -423,3 +425,71 @@ class PipelineTestCache(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     user = relationship("User")
+
+class ContentCache(Base):
+    """Tenant-neutral cache of fetched article text and AI enrichment, shared across sources and users."""
+    __tablename__ = "content_cache"
+
+    id = Column(String, primary_key=True, index=True, default=generate_uuid)
+    # cache_key is a hash of kind, canonical URL and (for analysis) content hash, prompt and model
+    cache_key = Column(String, unique=True, index=True)
+    kind = Column(String)  # 'page_text', 'analysis'
+    canonical_url = Column(String, index=True)
+    model = Column(String, nullable=True)
+    payload = Column(JSON)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class ContentFingerprint(Base):
+    """SimHash of analyzed article text, used to reuse enrichment for near-duplicate copies."""
+    __tablename__ = "content_fingerprints"
+
+    id = Column(String, primary_key=True, index=True, default=generate_uuid)
+    simhash = Column(String)  # 64-bit SimHash as 16 hex chars
+    # The hash split into four 16-bit bands; copies within 3 bits share at least one band
+    band0 = Column(Integer, index=True)
+    band1 = Column(Integer, index=True)
+    band2 = Column(Integer, index=True)
+    band3 = Column(Integer, index=True)
+    analysis_scope = Column(String, index=True)  # Hash of prompt + model the analysis was made with
+    analysis_key = Column(String)  # content_cache.cache_key of the first copy's analysis
+    canonical_url = Column(String)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class AIResponseCache(Base):
+    """Persistent LLM response cache keyed by rendered prompt, model and response mode."""
+    __tablename__ = "ai_response_cache"
+
+    id = Column(String, primary_key=True, index=True, default=generate_uuid)
+    cache_key = Column(String, unique=True, index=True)  # sha256 of mode, model and rendered prompt
+    model = Column(String)
+    mode = Column(String)  # e.g. 'analysis', 'application/json', 'text/plain'
+    response = Column(Text)
+    hits = Column(Integer, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_hit_at = Column(DateTime(timezone=True), nullable=True, index=True)
+
+class RelevanceLabel(Base):
+    """An article the AI relevance check rejected; negative training example for the local filter."""
+    __tablename__ = "relevance_labels"
+
+    id = Column(String, primary_key=True, index=True, default=generate_uuid)
+    user_id = Column(String, ForeignKey("users.id"), index=True)
+    topic_key = Column(String, index=True)  # Hash of the content_topic_focus the decision was made for
+    url = Column(String)
+    title = Column(String)
+    text = Column(Text)  # Truncated to relevance_filter.TEXT_CHARS
+    relevance_score = Column(Integer)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+class RelevanceModel(Base):
+    """Local relevance pre-filter trained per user and topic focus (see relevance_filter.py)."""
+    __tablename__ = "relevance_models"
+
+    id = Column(String, primary_key=True, index=True, default=generate_uuid)
+    user_id = Column(String, ForeignKey("users.id"), index=True)
+    topic_key = Column(String, index=True)
+    weights = Column(JSON)  # {"bias": float, "w": {feature index: weight}}
+    positives = Column(Integer, default=0)
+    negatives = Column(Integer, default=0)
+    reject_precision = Column(Float, nullable=True)  # Held-out precision of rejections at the default threshold
+    trained_at = Column(DateTime(timezone=True), server_default=func.now())
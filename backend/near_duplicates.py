@@ -0,0 +1,129 @@
+"""
+Near-duplicate detection for incoming articles.
+
+Wire stories get republished across many outlets with trivial edits (bylines,
+a changed headline, an extra paragraph). A 64-bit SimHash over word shingles
+maps such copies to hashes a few bits apart. Each analyzed article's hash is
+indexed in four 16-bit bands: two hashes within MAX_DISTANCE (<4) bits always
+share a band, so candidates come from one indexed query and are confirmed with
+the exact Hamming distance.
+"""
+import hashlib
+import os
+import re
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import ContentFingerprint, generate_uuid
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+MAX_DISTANCE = int(os.getenv("NEAR_DUP_MAX_DISTANCE", "3"))
+MIN_WORDS = int(os.getenv("NEAR_DUP_MIN_WORDS", "40"))  # Short snippets are too similar by chance
+WINDOW_DAYS = int(os.getenv("NEAR_DUP_WINDOW_DAYS", "7"))
+SHINGLE_SIZE = 3
+
+
+def _words(text: str) -> list:
+    return re.findall(r'\w+', (text or '').lower())
+
+
+def simhash(text: str):
+    """64-bit SimHash of the text's word shingles, or None if the text is too short to compare."""
+    words = _words(text)
+    if len(words) < MIN_WORDS:
+        return None
+
+    weights = [0] * 64
+    for i in range(len(words) - SHINGLE_SIZE + 1):
+        shingle = ' '.join(words[i:i + SHINGLE_SIZE])
+        h = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        for bit in range(64):
+            weights[bit] += 1 if (h >> bit) & 1 else -1
+
+    value = 0
+    for bit in range(64):
+        if weights[bit] > 0:
+            value |= 1 << bit
+    return value
+
+
+def bands(value: int) -> list:
+    return [(value >> (16 * i)) & 0xFFFF for i in range(4)]
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+def analysis_scope(prompt: str, model: str) -> str:
+    return hashlib.sha256(f"{prompt}\x1f{model or ''}".encode('utf-8')).hexdigest()
+
+
+def find_near_duplicate(db: Session, value: int, scope: str):
+    """Closest indexed fingerprint within MAX_DISTANCE for the same prompt/model, or None."""
+    b = bands(value)
+    since = datetime.now(timezone.utc) - timedelta(days=WINDOW_DAYS)
+    candidates = db.query(ContentFingerprint).filter(
+        ContentFingerprint.analysis_scope == scope,
+        ContentFingerprint.created_at >= since,
+        or_(
+            ContentFingerprint.band0 == b[0],
+            ContentFingerprint.band1 == b[1],
+            ContentFingerprint.band2 == b[2],
+            ContentFingerprint.band3 == b[3],
+        )
+    ).limit(200).all()
+
+    best, best_distance = None, MAX_DISTANCE + 1
+    for candidate in candidates:
+        distance = hamming(value, int(candidate.simhash, 16))
+        if distance < best_distance:
+            best, best_distance = candidate, distance
+    return best
+
+
+def index_fingerprint(value: int, scope: str, analysis_key: str, canonical_url: str):
+    """
+    Remember an analyzed article. Committed in its own short session (like content_cache writes),
+    so it is visible to later copies right away and never holds locks in the crawl's transaction.
+    """
+    b = bands(value)
+    db = SessionLocal()
+    try:
+        db.add(ContentFingerprint(
+            id=generate_uuid(),
+            simhash=f"{value:016x}",
+            band0=b[0], band1=b[1], band2=b[2], band3=b[3],
+            analysis_scope=scope,
+            analysis_key=analysis_key,
+            canonical_url=canonical_url,
+            created_at=datetime.now(timezone.utc),
+        ))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Fingerprint write failed for {canonical_url}: {e}")
+    finally:
+        db.close()
+
+
+def evict(db: Session, now: datetime = None) -> int:
+    """Delete fingerprints older than the match window; returns how many."""
+    now = now or datetime.now(timezone.utc)
+    try:
+        removed = db.query(ContentFingerprint).filter(
+            ContentFingerprint.created_at < now - timedelta(days=WINDOW_DAYS)
+        ).delete(synchronize_session=False)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Fingerprint eviction failed: {e}")
+        return 0
+    if removed:
+        logger.info(f"Evicted {removed} near-duplicate fingerprints")
+    return removed
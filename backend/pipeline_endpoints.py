@@ -43,7 +43,7 @@ def _update_next_run(pipeline: ReportPipeline):
             pipeline.next_run_at = None
     else:
         pipeline.next_run_at = None
-from ai_service import AIService
+from ai_service import get_ai_service
 
 router = APIRouter(prefix="/pipeline", tags=["pipeline"])
 
@@ -174,7 +174,7 @@ def get_available_models(current_user: User = Depends(get_current_user)):
         # Use user-specific keys if available, otherwise system defaults
         api_key = current_user.google_api_key if getattr(current_user, 'google_api_key_enabled', True) else None
         anthropic_key = getattr(current_user, 'anthropic_api_key', None) if getattr(current_user, 'anthropic_api_key_enabled', True) else None
-        service = AIService(api_key=api_key, anthropic_api_key=anthropic_key)
+        service = get_ai_service(api_key=api_key, anthropic_api_key=anthropic_key)
         
         models = service.list_models()
         
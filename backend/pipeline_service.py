@@ -11,7 +11,7 @@ from models import (
     SourceConfigLibrary, Report, User, PipelineTestCache, SystemConfig
 )
 from schemas import ArticleResponse
-from ai_service import AIService
+from ai_service import get_ai_service
 from email_service import send_report_email
 from jinja2 import Template
 from utils.debug_logger import PipelineDebugLogger
@@ -558,7 +558,7 @@ class PipelineExecutor:
             user_api_key = (user.google_api_key if getattr(user, 'google_api_key_enabled', True) else None) if user else None
             user_anthropic_key = (getattr(user, 'anthropic_api_key', None) if getattr(user, 'anthropic_api_key_enabled', True) else None) if user else None
 
-            ai_service = AIService(api_key=user_api_key, anthropic_api_key=user_anthropic_key)
+            ai_service = get_ai_service(api_key=user_api_key, anthropic_api_key=user_anthropic_key)
             
             # STORE DEBUG INFO
             context.update("step_2_processing", { "debug_prompt": combined_prompt })
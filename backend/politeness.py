@@ -0,0 +1,287 @@
+"""
+Per-host request pacing shared by every crawl fetch.
+
+Each publisher host gets a token bucket (GCRA): `burst` requests may go out at
+once, after that one request every 1/rate seconds. The host's robots.txt
+Crawl-delay slows the bucket further when it is stricter. Bucket state lives in
+Redis so all Celery workers pace the same host together; if Redis is not
+reachable we fall back to a per-process bucket.
+"""
+import asyncio
+import os
+import threading
+import time
+import weakref
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+from logger_config import setup_logger
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+logger = setup_logger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL") or "redis://localhost:6379/0"
+HOST_REQUESTS_PER_SECOND = float(os.getenv("POLITENESS_REQUESTS_PER_SECOND", "1"))
+HOST_BURST = int(os.getenv("POLITENESS_BURST", "3"))
+RESPECT_CRAWL_DELAY = os.getenv("POLITENESS_RESPECT_CRAWL_DELAY", "true").lower() != "false"
+ROBOTS_CACHE_TTL = int(os.getenv("ROBOTS_CACHE_TTL_SECONDS", "86400"))
+MAX_CRAWL_DELAY_SECONDS = 60.0  # Ignore absurd Crawl-delay values
+MAX_RETRY_AFTER_SECONDS = 600.0
+DEFAULT_THROTTLE_PAUSE_SECONDS = 30.0  # When a 429/503 has no Retry-After
+KEY_PREFIX = "politeness:"
+
+# Reserves the next slot for a host and returns how long the caller must wait (seconds). If the wait
+# would exceed ARGV[3] (negative = no limit), nothing is reserved and the wait is returned negated.
+# KEYS[1] = bucket key; ARGV = interval, burst, max wait
+_RESERVE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local interval = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local max_wait = tonumber(ARGV[3])
+local tat = math.max(tonumber(redis.call('GET', KEYS[1]) or '0'), now)
+local new_tat = tat + interval
+local delay = new_tat - now - burst * interval
+if delay < 0 then delay = 0 end
+if max_wait >= 0 and delay > max_wait then
+    return tostring(-delay)
+end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000) + 1000)
+return tostring(delay)
+"""
+
+# Pushes the host's next free slot to now + seconds (after a 429/503)
+_PENALIZE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local until_ts = now + tonumber(ARGV[1])
+local tat = tonumber(redis.call('GET', KEYS[1]) or '0')
+if until_ts > tat then
+    redis.call('SET', KEYS[1], tostring(until_ts), 'PX', math.ceil(tonumber(ARGV[1]) * 1000) + 1000)
+end
+return 1
+"""
+
+
+class PolitenessBudgetExceeded(Exception):
+    """The host's next free slot is further away than the caller is willing to wait."""
+
+
+def host_key(url: str) -> str:
+    host = (urlparse(url or "").hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def parse_retry_after(value) -> float:
+    """Retry-After header (seconds or HTTP date) in seconds, capped; 0 if absent or invalid."""
+    if not value:
+        return 0.0
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return 0.0
+    return max(0.0, min(seconds, MAX_RETRY_AFTER_SECONDS))
+
+
+def parse_crawl_delay(robots_txt: str):
+    """
+    Crawl-delay of the `User-agent: *` group, or None.
+    (urllib.robotparser only accepts whole seconds; many sites use values like 0.5.)
+    """
+    applies = False
+    in_agent_lines = False
+    for raw in (robots_txt or "").splitlines():
+        line = raw.split("#", 1)[0].strip()
+        if ":" not in line:
+            continue
+        field, value = (part.strip() for part in line.split(":", 1))
+        field = field.lower()
+        if field == "user-agent":
+            # Consecutive User-agent lines share one group
+            if not in_agent_lines:
+                applies = False
+            in_agent_lines = True
+            applies = applies or value == "*"
+            continue
+        in_agent_lines = False
+        if field == "crawl-delay" and applies:
+            try:
+                return max(0.0, float(value))
+            except ValueError:
+                return None
+    return None
+
+
+class HostRateLimiter:
+    def __init__(self, rate: float = HOST_REQUESTS_PER_SECOND, burst: int = HOST_BURST,
+                 respect_crawl_delay: bool = RESPECT_CRAWL_DELAY):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.burst = max(1, burst)
+        self.respect_crawl_delay = respect_crawl_delay
+        self._local_tat: dict = {}  # host -> theoretical arrival time (monotonic)
+        self._local_lock = threading.Lock()
+        self._robots: dict = {}  # host -> (expires_at, crawl_delay or None)
+        self._robots_locks: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._redis_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._redis_disabled_until = 0.0
+
+    # --- Redis ---------------------------------------------------------------
+
+    def _redis(self):
+        """Redis client for the running loop, or None while Redis is unavailable."""
+        if aioredis is None or time.monotonic() < self._redis_disabled_until:
+            return None
+        loop = asyncio.get_running_loop()
+        client = self._redis_clients.get(loop)
+        if client is None:
+            client = aioredis.from_url(REDIS_URL, socket_connect_timeout=2, socket_timeout=2)
+            self._redis_clients[loop] = client
+        return client
+
+    def _redis_failed(self, e: Exception):
+        # Back off for a minute instead of paying a connect timeout on every request
+        self._redis_disabled_until = time.monotonic() + 60
+        logger.warning(f"Politeness: Redis unavailable, pacing per process for 60s: {e}")
+
+    # --- robots.txt ----------------------------------------------------------
+
+    async def crawl_delay(self, url: str, client=None):
+        """Crawl-delay from the host's robots.txt (cached), or None."""
+        host = host_key(url)
+        cached = self._robots.get(host)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+        loop = asyncio.get_running_loop()
+        locks = self._robots_locks.setdefault(loop, {})
+        async with locks.setdefault(host, asyncio.Lock()):
+            cached = self._robots.get(host)
+            if cached and cached[0] > time.monotonic():
+                return cached[1]
+
+            delay = await self._load_crawl_delay(url, client)
+            self._robots[host] = (time.monotonic() + ROBOTS_CACHE_TTL, delay)
+            return delay
+
+    async def _load_crawl_delay(self, url: str, client):
+        host = host_key(url)
+        redis = self._redis()
+        cache_key = f"{KEY_PREFIX}robots:{host}"
+        if redis is not None:
+            try:
+                value = await redis.get(cache_key)
+                if value is not None:
+                    return float(value) if value else None
+            except Exception as e:
+                self._redis_failed(e)
+                redis = None
+
+        delay = None
+        if client is not None:
+            parsed = urlparse(url)
+            robots_url = f"{parsed.scheme}://{parsed.netloc}/robots.txt"
+            try:
+                resp = await client.get(robots_url, timeout=10)
+                if resp.status_code == 200:
+                    value = parse_crawl_delay(resp.text)
+                    if value:
+                        delay = min(value, MAX_CRAWL_DELAY_SECONDS)
+                        logger.info(f"Politeness: {host} asks for Crawl-delay {delay}s")
+            except Exception as e:
+                logger.debug(f"Politeness: could not read robots.txt for {host}: {e}")
+
+        if redis is not None:
+            try:
+                await redis.set(cache_key, "" if delay is None else str(delay), ex=ROBOTS_CACHE_TTL)
+            except Exception as e:
+                self._redis_failed(e)
+        return delay
+
+    # --- pacing --------------------------------------------------------------
+
+    async def wait(self, url: str, client=None, max_wait: float = None):
+        """
+        Block until a request to the URL's host is allowed. With `max_wait`, raises
+        PolitenessBudgetExceeded (without taking a slot) instead of waiting longer than that.
+        """
+        host = host_key(url)
+        if not host:
+            return
+
+        interval, burst = self.interval, self.burst
+        if self.respect_crawl_delay:
+            delay = await self.crawl_delay(url, client)
+            if delay and delay > interval:
+                interval, burst = delay, 1
+
+        if interval <= 0:
+            return
+
+        wait_seconds = await self._reserve(host, interval, burst, -1.0 if max_wait is None else max(0.0, max_wait))
+        if wait_seconds < 0:
+            raise PolitenessBudgetExceeded(f"{host}: next slot in {-wait_seconds:.0f}s")
+        if wait_seconds > 0:
+            logger.debug(f"Politeness: waiting {wait_seconds:.2f}s for {host}")
+            await asyncio.sleep(wait_seconds)
+
+    async def _reserve(self, host: str, interval: float, burst: int, max_wait: float = -1.0) -> float:
+        """Wait for the reserved slot, or minus the wait if it exceeds max_wait (>= 0) and nothing was reserved."""
+        redis = self._redis()
+        if redis is not None:
+            try:
+                return float(await redis.eval(_RESERVE_SCRIPT, 1, f"{KEY_PREFIX}bucket:{host}", interval, burst, max_wait))
+            except Exception as e:
+                self._redis_failed(e)
+
+        now = time.monotonic()
+        with self._local_lock:
+            tat = max(self._local_tat.get(host, 0.0), now)
+            new_tat = tat + interval
+            delay = max(0.0, new_tat - now - burst * interval)
+            if 0 <= max_wait < delay:
+                return -delay
+            self._local_tat[host] = new_tat
+        return delay
+
+    async def penalize(self, url: str, seconds: float):
+        """Hold back every request to the URL's host for `seconds` (e.g. from Retry-After)."""
+        host = host_key(url)
+        if not host or seconds <= 0:
+            return
+        logger.warning(f"Politeness: {host} throttled us, pausing it for {seconds:.0f}s")
+
+        redis = self._redis()
+        if redis is not None:
+            try:
+                await redis.eval(_PENALIZE_SCRIPT, 1, f"{KEY_PREFIX}bucket:{host}", seconds)
+                return
+            except Exception as e:
+                self._redis_failed(e)
+
+        with self._local_lock:
+            until = time.monotonic() + seconds
+            if until > self._local_tat.get(host, 0.0):
+                self._local_tat[host] = until
+
+
+host_limiter = HostRateLimiter()
+
+
+async def polite_get(client, url: str, max_wait: float = None, **kwargs):
+    """
+    client.get() paced per host; 429/503 responses push back the host's next slot.
+    Raises PolitenessBudgetExceeded if the host's next slot is more than `max_wait` seconds away.
+    """
+    await host_limiter.wait(url, client, max_wait=max_wait)
+    response = await client.get(url, **kwargs)
+    if response.status_code in (429, 503):
+        seconds = parse_retry_after(response.headers.get("Retry-After")) or DEFAULT_THROTTLE_PAUSE_SECONDS
+        await host_limiter.penalize(url, seconds)
+    return response
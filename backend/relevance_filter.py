@@ -0,0 +1,233 @@
+"""
+Local relevance pre-filter.
+
+A logistic regression over hashed word uni/bigrams, trained per user and
+content_topic_focus on our own history: articles we saved are positives,
+articles the AI relevance check rejected (RelevanceLabel) are negatives. The
+crawler asks it before any LLM call and drops items it is confident are off
+topic; everything else still goes to the AI.
+
+A model is only used when its held-out rejections were precise enough
+(MIN_REJECT_PRECISION). Articles it rejects are not recorded as labels, so it
+never trains on its own decisions.
+"""
+import hashlib
+import math
+import os
+import random
+import re
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import Article, Source, SystemConfig, RelevanceLabel, RelevanceModel, generate_uuid
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_THRESHOLD = float(os.getenv("LOCAL_RELEVANCE_THRESHOLD", "0.95"))  # P(off-topic) needed to reject
+MIN_REJECT_PRECISION = 0.95
+MIN_EXAMPLES_PER_CLASS = int(os.getenv("LOCAL_RELEVANCE_MIN_EXAMPLES", "50"))
+MAX_EXAMPLES_PER_CLASS = 5000
+TRAINING_WINDOW_DAYS = 90
+RETRAIN_HOURS = int(os.getenv("LOCAL_RELEVANCE_RETRAIN_HOURS", "24"))
+TEXT_CHARS = 2000
+FEATURE_BITS = 20
+EPOCHS = 8
+LEARNING_RATE = 0.5
+L2 = 1e-6
+
+_loaded: dict = {}  # (user_id, topic_key) -> (trained_at, RelevanceFilter)
+
+
+def topic_key(topic_focus: str) -> str:
+    normalized = re.sub(r'\s+', ' ', (topic_focus or '').strip().lower())
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()[:16]
+
+
+def features(title: str, text: str) -> dict:
+    """Hashed, L2-normalized presence features: title words, and text uni/bigrams."""
+    title_words = re.findall(r'\w+', (title or '').lower())
+    text_words = re.findall(r'\w+', (text or '')[:TEXT_CHARS].lower())
+    tokens = {f"t:{w}" for w in title_words}
+    tokens.update(text_words)
+    tokens.update(f"{a} {b}" for a, b in zip(text_words, text_words[1:]))
+    if not tokens:
+        return {}
+
+    mask = (1 << FEATURE_BITS) - 1
+    indices = {int.from_bytes(hashlib.blake2b(t.encode('utf-8'), digest_size=4).digest(), 'big') & mask for t in tokens}
+    value = 1 / math.sqrt(len(indices))
+    return {i: value for i in indices}
+
+
+def _sigmoid(z: float) -> float:
+    if z < -30:
+        return 0.0
+    if z > 30:
+        return 1.0
+    return 1 / (1 + math.exp(-z))
+
+
+class RelevanceFilter:
+    def __init__(self, weights: dict, bias: float):
+        self.weights = weights
+        self.bias = bias
+
+    def probability(self, title: str, text: str) -> float:
+        """Probability that the article is relevant (would pass the AI check)."""
+        x = features(title, text)
+        return _sigmoid(self.bias + sum(self.weights.get(i, 0.0) * v for i, v in x.items()))
+
+    def rejects(self, title: str, text: str, threshold: float = DEFAULT_THRESHOLD) -> tuple:
+        """(reject?, probability relevant)"""
+        p = self.probability(title, text)
+        return 1 - p >= threshold, p
+
+
+def _fit(examples: list, seed: int = 42) -> RelevanceFilter:
+    """Class-balanced logistic regression with SGD; examples are (features, label)."""
+    positives = sum(1 for _, y in examples if y)
+    class_weight = {1: len(examples) / (2 * positives), 0: len(examples) / (2 * (len(examples) - positives))}
+    weights, bias = {}, 0.0
+    order = list(examples)
+    rng = random.Random(seed)
+    for epoch in range(EPOCHS):
+        rng.shuffle(order)
+        lr = LEARNING_RATE / (1 + epoch)
+        for x, y in order:
+            p = _sigmoid(bias + sum(weights.get(i, 0.0) * v for i, v in x.items()))
+            g = (p - y) * class_weight[y] * lr
+            bias -= g
+            for i, v in x.items():
+                w = weights.get(i, 0.0)
+                weights[i] = w - g * v - lr * L2 * w
+    return RelevanceFilter({i: w for i, w in weights.items() if abs(w) > 1e-4}, bias)
+
+
+def _reject_precision(model: RelevanceFilter, holdout: list, threshold: float):
+    """Share of held-out rejections that were true negatives; None if it rejected nothing."""
+    rejected = [y for x, y in holdout if 1 - _sigmoid(model.bias + sum(model.weights.get(i, 0.0) * v for i, v in x.items())) >= threshold]
+    if not rejected:
+        return None
+    return sum(1 for y in rejected if not y) / len(rejected)
+
+
+def train(db: Session, user_id: str, topic_focus: str, now: datetime = None):
+    """(Re)train the user's filter for this topic; returns the stored model, or None without enough data."""
+    now = now or datetime.now(timezone.utc)
+    key = topic_key(topic_focus)
+    since = now - timedelta(days=TRAINING_WINDOW_DAYS)
+
+    positives = db.query(Article.raw_title, Article.content_snippet).join(Source, Article.source_id == Source.id).filter(
+        Source.user_id == user_id,
+        Article.scraped_at >= since
+    ).order_by(Article.scraped_at.desc()).limit(MAX_EXAMPLES_PER_CLASS).all()
+    negatives = db.query(RelevanceLabel.title, RelevanceLabel.text).filter(
+        RelevanceLabel.user_id == user_id,
+        RelevanceLabel.topic_key == key,
+        RelevanceLabel.created_at >= since
+    ).order_by(RelevanceLabel.created_at.desc()).limit(MAX_EXAMPLES_PER_CLASS).all()
+    if len(positives) < MIN_EXAMPLES_PER_CLASS or len(negatives) < MIN_EXAMPLES_PER_CLASS:
+        logger.info(f"Relevance filter for user {user_id}: not enough examples ({len(positives)} saved, {len(negatives)} rejected)")
+        return None
+
+    examples = [(features(t, x), 1) for t, x in positives] + [(features(t, x), 0) for t, x in negatives]
+    examples = [(x, y) for x, y in examples if x]
+    random.Random(0).shuffle(examples)
+    split = max(1, len(examples) // 5)
+    holdout, training = examples[:split], examples[split:]
+
+    precision = _reject_precision(_fit(training), holdout, DEFAULT_THRESHOLD)
+    model = _fit(examples)
+
+    row = db.query(RelevanceModel).filter(RelevanceModel.user_id == user_id, RelevanceModel.topic_key == key).first()
+    if row is None:
+        row = RelevanceModel(id=generate_uuid(), user_id=user_id, topic_key=key)
+        db.add(row)
+    row.weights = {"bias": model.bias, "w": {str(i): round(w, 6) for i, w in model.weights.items()}}
+    row.positives = len(positives)
+    row.negatives = len(negatives)
+    row.reject_precision = precision
+    row.trained_at = now
+    logger.info(f"Relevance filter trained for user {user_id}: {len(positives)}/{len(negatives)} examples, held-out reject precision {precision}")
+    return row
+
+
+def load(db: Session, user_id: str, topic_focus: str):
+    """The user's usable filter for this topic, or None (untrained or not precise enough)."""
+    key = topic_key(topic_focus)
+    row = db.query(RelevanceModel).filter(RelevanceModel.user_id == user_id, RelevanceModel.topic_key == key).first()
+    if row is None or row.reject_precision is None or row.reject_precision < MIN_REJECT_PRECISION:
+        return None
+
+    cached = _loaded.get((user_id, key))
+    if cached is not None and cached[0] == row.trained_at:
+        return cached[1]
+    payload = row.weights or {}
+    model = RelevanceFilter({int(i): w for i, w in (payload.get("w") or {}).items()}, payload.get("bias", 0.0))
+    _loaded[(user_id, key)] = (row.trained_at, model)
+    return model
+
+
+def record_rejections(user_id: str, topic_focus: str, rejections: list):
+    """
+    Remember AI relevance rejections, given as (url, title, text, score), as negative examples.
+    One label per URL: rejected articles are never saved, so they come back on every crawl, and
+    repeats would swamp the training set and the holdout. Committed in its own short session so the
+    crawl's transaction never holds these locks across its awaits.
+    """
+    key = topic_key(topic_focus)
+    now = datetime.now(timezone.utc)
+    latest = {url: (title, text, score) for url, title, text, score in rejections if url}
+    db = SessionLocal()
+    try:
+        existing = {}
+        urls = list(latest)
+        for i in range(0, len(urls), 500):
+            existing.update((row.url, row) for row in db.query(RelevanceLabel).filter(
+                RelevanceLabel.user_id == user_id,
+                RelevanceLabel.topic_key == key,
+                RelevanceLabel.url.in_(urls[i:i + 500])
+            ).all())
+
+        for url, (title, text, score) in latest.items():
+            row = existing.get(url)
+            if row is None:
+                row = RelevanceLabel(id=generate_uuid(), user_id=user_id, topic_key=key, url=url)
+                db.add(row)
+            row.title = title
+            row.text = (text or '')[:TEXT_CHARS]
+            row.relevance_score = score
+            row.created_at = now
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Recording relevance labels failed for user {user_id}: {e}")
+    finally:
+        db.close()
+
+
+def retrain_due(db: Session, now: datetime = None) -> int:
+    """Retrain every user's filter older than RETRAIN_HOURS; returns how many were trained."""
+    now = now or datetime.now(timezone.utc)
+    trained = 0
+    for config in db.query(SystemConfig).filter(SystemConfig.user_id != None).all():
+        topic = config.content_topic_focus or "Economics, Trade, Politics, or Finance"
+        row = db.query(RelevanceModel).filter(
+            RelevanceModel.user_id == config.user_id,
+            RelevanceModel.topic_key == topic_key(topic)
+        ).first()
+        if row is not None and row.trained_at:
+            last = row.trained_at if row.trained_at.tzinfo else row.trained_at.replace(tzinfo=timezone.utc)
+            if last > now - timedelta(hours=RETRAIN_HOURS):
+                continue
+        try:
+            if train(db, config.user_id, topic, now) is not None:
+                trained += 1
+            db.commit()
+        except Exception as e:
+            logger.error(f"Relevance filter training failed for user {config.user_id}: {e}")
+            db.rollback()
+    return trained
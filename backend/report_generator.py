@@ -5,7 +5,7 @@ from schemas import ReportCreate
 from datetime import datetime
 import json
 import logging
-from ai_service import AIService, _strip_json_fences
+from ai_service import get_ai_service, _strip_json_fences
 import time
 
 logger = logging.getLogger(__name__)
@@ -62,7 +62,7 @@ class ReportGenerator:
             model_name = sys_config.report_model or "gemini-2.5-flash-lite"
             custom_prompt = sys_config.report_prompt
 
-        ai_service = AIService(api_key=google_key, anthropic_api_key=anthropic_key)
+        ai_service = get_ai_service(api_key=google_key, anthropic_api_key=anthropic_key)
 
         # 2. Fetch Context Articles
         # Filter by Date Range
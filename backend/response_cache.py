@@ -0,0 +1,136 @@
+"""
+Content-addressed cache for LLM responses.
+
+Sits in front of AIService.analyze_article and AIService.call: the key is a hash
+of the fully rendered prompt, the model and the response mode, so re-crawled or
+reprocessed content with an unchanged prompt never reaches the provider twice.
+Entries expire after AI_CACHE_TTL_HOURS; once the table grows past
+AI_CACHE_MAX_ENTRIES the least recently used entries are evicted.
+"""
+import hashlib
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+from database import SessionLocal
+from models import AIResponseCache, generate_uuid
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+AI_CACHE_ENABLED = os.getenv("AI_CACHE_ENABLED", "true").lower() != "false"
+AI_CACHE_TTL_HOURS = int(os.getenv("AI_CACHE_TTL_HOURS", str(24 * 7)))
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "20000"))
+EVICTION_CHECK_EVERY = 100  # Stores between size checks
+
+_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name: str, n: int = 1):
+    with _stats_lock:
+        _stats[name] += n
+
+
+def cache_key(prompt: str, model: str, mode: str) -> str:
+    return hashlib.sha256(f"{mode}\x1f{model}\x1f{prompt}".encode("utf-8")).hexdigest()
+
+
+def get(prompt: str, model: str, mode: str):
+    """Cached response text, or None on a miss (or when the cache is disabled)."""
+    if not AI_CACHE_ENABLED:
+        return None
+    key = cache_key(prompt, model, mode)
+    db = SessionLocal()
+    try:
+        entry = db.query(AIResponseCache).filter(AIResponseCache.cache_key == key).first()
+        now = datetime.now(timezone.utc)
+        if entry is not None:
+            created = entry.created_at
+            if created is not None and created.tzinfo is None:
+                created = created.replace(tzinfo=timezone.utc)
+            if created is None or created >= now - timedelta(hours=AI_CACHE_TTL_HOURS):
+                entry.hits = (entry.hits or 0) + 1
+                entry.last_hit_at = now
+                db.commit()
+                _count("hits")
+                logger.info(f"AI response cache hit | Model: {model} | Mode: {mode}")
+                return entry.response
+            db.delete(entry)  # Expired
+            db.commit()
+        _count("misses")
+        return None
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"AI response cache lookup failed: {e}")
+        return None
+    finally:
+        db.close()
+
+
+def put(prompt: str, model: str, mode: str, response: str):
+    if not AI_CACHE_ENABLED or not response:
+        return
+    key = cache_key(prompt, model, mode)
+    db = SessionLocal()
+    try:
+        entry = db.query(AIResponseCache).filter(AIResponseCache.cache_key == key).first()
+        now = datetime.now(timezone.utc)
+        if entry is None:
+            db.add(AIResponseCache(id=generate_uuid(), cache_key=key, model=model, mode=mode,
+                                   response=response, hits=0, created_at=now, last_hit_at=now))
+        else:
+            entry.response = response
+            entry.created_at = now
+        db.commit()
+        _count("stores")
+    except Exception as e:
+        # A concurrent worker may have stored the same key first
+        db.rollback()
+        logger.debug(f"AI response cache store skipped: {e}")
+        return
+    finally:
+        db.close()
+
+    if _stats["stores"] % EVICTION_CHECK_EVERY == 0:
+        evict()
+
+
+def evict():
+    """Drop expired entries, then least recently used ones beyond AI_CACHE_MAX_ENTRIES."""
+    db = SessionLocal()
+    try:
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=AI_CACHE_TTL_HOURS)
+        removed = db.query(AIResponseCache).filter(AIResponseCache.created_at < cutoff).delete(synchronize_session=False)
+
+        overflow = db.query(AIResponseCache).count() - AI_CACHE_MAX_ENTRIES
+        if overflow > 0:
+            oldest = db.query(AIResponseCache.id).order_by(AIResponseCache.last_hit_at.asc()).limit(overflow).subquery()
+            removed += db.query(AIResponseCache).filter(AIResponseCache.id.in_(oldest)).delete(synchronize_session=False)
+        db.commit()
+        if removed:
+            _count("evictions", removed)
+            logger.info(f"AI response cache evicted {removed} entries")
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"AI response cache eviction failed: {e}")
+    finally:
+        db.close()
+
+
+def stats() -> dict:
+    """Hit/miss counters of this process plus the table's size and lifetime hits."""
+    with _stats_lock:
+        result = dict(_stats)
+    lookups = result["hits"] + result["misses"]
+    result["hit_rate"] = round(result["hits"] / lookups, 3) if lookups else None
+    db = SessionLocal()
+    try:
+        from sqlalchemy import func
+        entries, total_hits = db.query(func.count(AIResponseCache.id), func.sum(AIResponseCache.hits)).one()
+        result.update({"entries": entries, "lifetime_hits": total_hits or 0})
+    except Exception as e:
+        logger.debug(f"AI response cache stats unavailable: {e}")
+    finally:
+        db.close()
+    return result
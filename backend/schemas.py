@@ -29,6 +29,7 @@ class SystemConfigUpdate(BaseModel):
     
     analysis_model: Optional[str] = None
     analysis_prompt: Optional[str] = None
+    enrichment_profile: Optional[str] = None
     clustering_model: Optional[str] = None
     clustering_prompt: Optional[str] = None
     report_model: Optional[str] = None
@@ -185,6 +186,7 @@ class SettingsSchema(BaseModel):
     
     analysis_model: Optional[str] = None
     analysis_prompt: Optional[str] = None
+    enrichment_profile: Optional[str] = None
     clustering_model: Optional[str] = None
     clustering_prompt: Optional[str] = None
     report_model: Optional[str] = None
@@ -8,10 +8,16 @@ from pipeline_service import PipelineExecutor
 from croniter import croniter
 from sqlalchemy import or_
 from crawler import run_crawler
+from crawl_engine import run_crawl_batch
+from crawl_scheduler import next_crawl_at, circuit_state, begin_probe, claim_crawl, crawling_since
 from clustering import analyze_clusters
+import os
 
 logger = get_task_logger(__name__)
 
+# Sources handed to one worker per batch task; the engine crawls them concurrently
+CRAWL_BATCH_SIZE = int(os.getenv("CRAWL_BATCH_SIZE", "25"))
+
 @shared_task(name="tasks.crawl_source_task")
 def crawl_source_task(source_id: str):
     logger.info(f"Starting crawl task for source {source_id}")
@@ -22,6 +28,16 @@ def crawl_source_task(source_id: str):
         logger.error(f"Crawl task failed for {source_id}: {e}")
         raise e
 
+@shared_task(name="tasks.crawl_sources_batch_task")
+def crawl_sources_batch_task(source_ids: list):
+    logger.info(f"Starting batch crawl task for {len(source_ids)} sources")
+    try:
+        summary = run_crawl_batch(source_ids)
+        return f"Batch crawl completed: {summary}"
+    except Exception as e:
+        logger.error(f"Batch crawl task failed: {e}")
+        raise e
+
 @shared_task(name="tasks.clustering_task")
 def clustering_task(user_id: str, api_key: str, anthropic_api_key: str = None):
     logger.info(f"Starting clustering task for user {user_id}")
@@ -101,7 +117,7 @@ def check_scheduled_crawls():
 # ... (existing content below)
     """
     Checks for sources that are due for a crawl.
-    Logic: last_crawled_at + crawl_interval (minutes) <= now
+    Logic: last_crawled_at + adaptive (or configured) interval <= now
     """
     db: Session = SessionLocal()
     try:
@@ -111,14 +127,13 @@ def check_scheduled_crawls():
         # Get all sources (we filter below for status and timing)
         sources = db.query(Source).all()
         
-        triggered_count = 0
+        due_ids = []
         for source in sources:
             # 1. Reset Stuck Crawlers
             if source.status == 'crawling':
-                last = source.last_crawled_at
-                # If it has a timestamp, check if it's older than 60 mins
+                # Claimed at dispatch (or crawled) within the last 60 mins: still queued or running
+                last = crawling_since(source)
                 if last:
-                    if last.tzinfo is None: last = last.replace(tzinfo=timezone.utc)
                     if (now - last).total_seconds() > 3600:
                         logger.warning(f"Source {source.id} ({source.name}) appears stuck in 'crawling'. Resetting to 'error'.")
                         source.status = 'error'
@@ -136,23 +151,26 @@ def check_scheduled_crawls():
             if source.status not in ['active', 'error']:
                 continue
             
-            # ... (rest of the logic remains same)
-            interval_mins = source.crawl_interval if source.crawl_interval else 15
-            should_crawl = False
-            
-            if not source.last_crawled_at:
-                should_crawl = True
-            else:
-                last = source.last_crawled_at
-                if last.tzinfo is None: last = last.replace(tzinfo=timezone.utc)
-                if last + timedelta(minutes=interval_mins) <= now:
-                    should_crawl = True
+            # Adaptive interval when the source has one (see crawl_scheduler), else crawl_interval
+            due_at = next_crawl_at(source)
+            should_crawl = due_at is None or due_at <= now
             
             if should_crawl:
-                logger.info(f"Triggering scheduled crawl for {source.name or source.url} (ID: {source.id})")
-                crawl_source_task.delay(source.id)
-                triggered_count += 1
-                
+                if circuit_state(source) == 'open':
+                    # Parked after repeated failures: let one probe through
+                    begin_probe(source, now)
+                logger.info(f"Scheduling crawl for {source.name or source.url} (ID: {source.id})")
+                claim_crawl(source, now)
+                due_ids.append(source.id)
+
+        # Persist claims and half-open markers before dispatching, so the next check skips these sources
+        db.commit()
+
+        # 3. Dispatch due sources in batches so each worker crawls many of them concurrently
+        for i in range(0, len(due_ids), CRAWL_BATCH_SIZE):
+            crawl_sources_batch_task.delay(due_ids[i:i + CRAWL_BATCH_SIZE])
+
+        triggered_count = len(due_ids)
         logger.info(f"Schedule check complete. Triggered {triggered_count} crawls.")
         return f"Triggered {triggered_count} crawls"
     
@@ -234,3 +252,31 @@ def check_scheduled_pipelines():
         logger.error(f"Error checking pipeline schedule: {e}")
     finally:
         db.close()
+
+@shared_task(name="tasks.retrain_relevance_filters")
+def retrain_relevance_filters():
+    """Retrains each user's local relevance pre-filter once it is older than RETRAIN_HOURS."""
+    from relevance_filter import retrain_due
+    db: Session = SessionLocal()
+    try:
+        trained = retrain_due(db)
+        return f"Retrained {trained} relevance filters"
+    except Exception as e:
+        logger.error(f"Error retraining relevance filters: {e}")
+    finally:
+        db.close()
+
+@shared_task(name="tasks.evict_content_cache")
+def evict_content_cache():
+    """Deletes expired shared content cache entries and near-duplicate fingerprints."""
+    import content_cache
+    import near_duplicates
+    db: Session = SessionLocal()
+    try:
+        cached = content_cache.evict(db)
+        fingerprints = near_duplicates.evict(db)
+        return f"Evicted {cached} cache entries and {fingerprints} fingerprints"
+    except Exception as e:
+        logger.error(f"Error evicting content cache: {e}")
+    finally:
+        db.close()
@@ -0,0 +1,104 @@
+"""
+Deterministic article text cleaning.
+
+Produces the text stored as Article.content_snippet and sent to the LLM, so the
+analysis no longer has to echo a cleaned copy of the article back:
+
+- full pages: trafilatura main-content extraction, readability as fallback,
+- feed summaries / snippets: HTML stripped to text,
+- both: boilerplate lines (read more, share, subscribe, ads, cookie notices,
+  photo credits...) dropped and whitespace normalized.
+"""
+import re
+
+import trafilatura
+from bs4 import BeautifulSoup
+
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+_HTML_TAG = re.compile(r'<(p|br|div|span|a|img|strong|em|b|i|ul|li|h[1-6]|figure|table)\b', re.IGNORECASE)
+_NON_CONTENT_TAGS = ['script', 'style', 'noscript', 'svg', 'iframe', 'form', 'button', 'nav', 'footer', 'aside', 'figure']
+
+# UI chrome rather than journalism (en, es, pt, fr, de, it): lines that are only one of these phrases...
+_CHROME_PHRASES = (
+    r'read more|read next|continue reading|related( articles| stories)?|see also|more on this story|'
+    r'share( this( article| story)?)?( on (facebook|twitter|x|whatsapp|linkedin))?|follow us( on \w+)?( now)?|sign up|subscribe( now)?|'
+    r'advertisement|sponsored( content)?|click here|accept( all)? cookies|cookie (policy|settings)|'
+    r'lea también|leer más|publicidad|suscr[ií]bete|compartir|'
+    r'leia também|leia mais|publicidade|assine|compartilhe|'
+    r'lire aussi|lire la suite|publicité|abonnez-vous|partager|'
+    r'mehr zum thema|weiterlesen|anzeige|teilen|'
+    r'leggi anche|leggi tutto|pubblicità|condividi'
+)
+_CHROME_LINE = re.compile(rf'^\W*({_CHROME_PHRASES})\W*$', re.IGNORECASE)
+# ...or start with one of these followed by a separator ("Read more: ...", "Photo: ...", "© 2024 ...")
+_CHROME_PREFIX = re.compile(
+    rf'^\W*(({_CHROME_PHRASES}|photo|image|credit|foto|crédito|crédit)\s*[:»›→|]|©|all rights reserved|todos los derechos|todos os direitos)',
+    re.IGNORECASE
+)
+_URL_ONLY = re.compile(r'^\s*(https?://|www\.)\S+\s*$')
+# Inline markup stays in its sentence; only these start a new line
+_BLOCK_TAGS = ['p', 'div', 'li', 'ul', 'ol', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote', 'pre',
+               'section', 'article', 'header', 'table', 'tr', 'td', 'th', 'dt', 'dd']
+# Repeated short lines ("Reuters", a dateline) can be real content; only longer paragraphs are deduplicated
+DEDUPE_MIN_CHARS = 40
+
+
+def _html_to_text(html: str) -> str:
+    soup = BeautifulSoup(html, 'lxml')
+    for tag in soup(_NON_CONTENT_TAGS):
+        tag.decompose()
+    for br in soup('br'):
+        br.replace_with('\n')
+    for tag in soup(_BLOCK_TAGS):
+        tag.insert_before('\n')
+        tag.append('\n')
+    return soup.get_text()
+
+
+def strip_boilerplate(text: str) -> str:
+    """Drop boilerplate lines and repeated paragraphs, normalize whitespace; paragraphs stay on their own lines."""
+    lines = []
+    seen = set()
+    for line in (text or '').splitlines():
+        line = re.sub(r'\s+', ' ', line).strip()
+        if not line or _URL_ONLY.match(line) or _CHROME_LINE.match(line) or _CHROME_PREFIX.match(line):
+            continue
+        if len(line) >= DEDUPE_MIN_CHARS:
+            key = line.lower()
+            if key in seen:
+                continue
+            seen.add(key)
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def clean_text(text: str) -> str:
+    """Clean a snippet or feed summary that may contain HTML."""
+    if not text:
+        return ''
+    if _HTML_TAG.search(text):
+        text = _html_to_text(text)
+    return strip_boilerplate(text)
+
+
+def extract_page_text(html: str) -> str:
+    """Main article text of a full HTML page ('' if nothing article-like was found). CPU-bound."""
+    if not html:
+        return ''
+    try:
+        text = trafilatura.extract(html, include_comments=False, include_tables=False, favor_precision=True)
+        if text:
+            return strip_boilerplate(text)
+    except Exception as e:
+        logger.debug(f"trafilatura extraction failed: {e}")
+
+    try:
+        from readability import Document
+        summary = Document(html).summary(html_partial=True)
+        return clean_text(summary)
+    except Exception as e:
+        logger.debug(f"readability extraction failed: {e}")
+    return ''
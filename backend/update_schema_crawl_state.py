@@ -0,0 +1,31 @@
+"""Migration: add crawl_state (crawler-managed JSON) to sources table."""
+import logging
+from database import engine
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+
+def _add_column_if_missing(col_name: str, table: str, col_def: str):
+    """Add a column inside its own connection/transaction. Silently skips if already exists."""
+    with engine.connect() as conn:
+        try:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {col_name} {col_def}"))
+            conn.commit()
+            logger.info(f"Added column {table}.{col_name}")
+        except Exception as e:
+            conn.rollback()
+            msg = str(e).lower()
+            if "already exists" in msg or "duplicate column" in msg:
+                logger.debug(f"Column {table}.{col_name} already exists, skipping.")
+            else:
+                logger.error(f"Migration error adding {table}.{col_name}: {e}")
+
+
+def migrate():
+    # JSON on both SQLite and PostgreSQL (matches the JSON columns created by create_all)
+    _add_column_if_missing("crawl_state", "sources", "JSON")
+
+
+if __name__ == "__main__":
+    migrate()
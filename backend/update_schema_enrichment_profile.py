@@ -0,0 +1,30 @@
+"""Migration: add enrichment_profile to system_config table."""
+import logging
+from database import engine
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+
+def _add_column_if_missing(col_name: str, table: str, col_def: str):
+    """Add a column inside its own connection/transaction. Silently skips if already exists."""
+    with engine.connect() as conn:
+        try:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {col_name} {col_def}"))
+            conn.commit()
+            logger.info(f"Added column {table}.{col_name}")
+        except Exception as e:
+            conn.rollback()
+            msg = str(e).lower()
+            if "already exists" in msg or "duplicate column" in msg:
+                logger.debug(f"Column {table}.{col_name} already exists, skipping.")
+            else:
+                logger.error(f"Migration error adding {table}.{col_name}: {e}")
+
+
+def migrate():
+    _add_column_if_missing("enrichment_profile", "system_config", "VARCHAR DEFAULT 'full'")
+
+
+if __name__ == "__main__":
+    migrate()
@@ -158,7 +158,7 @@ export default function SourceCard({ source, onUpdate, onEdit, onCrawl }: Source
                         {/* Status Icon */}
                         {source.last_crawl_status && (
                             <div title={source.last_crawl_status} style={{ display: 'flex', alignItems: 'center' }}>
-                                {source.last_crawl_status === 'success' ? (
+                                {source.last_crawl_status === 'success' || source.last_crawl_status === 'not_modified' ? (
                                     <svg width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="#10B981" strokeWidth="3" strokeLinecap="round" strokeLinejoin="round">
                                         <polyline points="20 6 9 17 4 12"></polyline>
                                     </svg>
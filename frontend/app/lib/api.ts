@@ -147,6 +147,7 @@ export interface Source {
         pdf_model?: string;
         analysis_prompt?: string;
         pdf_prompt?: string;
+        enrichment_profile?: string;
     };
     last_crawled_at?: string;
     status: string;
@@ -286,6 +287,7 @@ export interface SystemSettings {
 
     analysis_model: string;
     analysis_prompt: string | null;
+    enrichment_profile?: string;
     clustering_model: string;
     clustering_prompt: string | null;
     report_model: string;
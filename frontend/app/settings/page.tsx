@@ -268,6 +268,19 @@ export default function SettingsPage() {
                                                 </div>
                                             )}
                                         </div>
+                                        <div className={styles.formGroup}>
+                                            <label className={styles.label}>Enrichment Profile</label>
+                                            <select
+                                                value={settings.enrichment_profile || 'full'}
+                                                onChange={e => handleChange('enrichment_profile', e.target.value)}
+                                                className={styles.select}
+                                            >
+                                                <option value="minimal">Minimal (language, relevance, headline, tags, sentiment)</option>
+                                                <option value="standard">Standard (+ entities and summary)</option>
+                                                <option value="full">Full (+ translated text)</option>
+                                            </select>
+                                            <p className={styles.helperText}>Smaller profiles ask the AI for less output per article.</p>
+                                        </div>
                                     </div>
                                     <details style={{ marginTop: '1.5rem' }}>
                                         <summary style={{ cursor: 'pointer', color: '#64748b', fontSize: '0.9rem', marginBottom: '0.75rem', fontWeight: 500, listStyle: 'none' }}>► Advanced: Analysis System Prompt</summary>